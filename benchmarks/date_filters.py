@@ -0,0 +1,107 @@
+"""
+对比 date(time) >= date(?) 和 time >= ? 两种日期过滤方式的查询计划和耗时
+
+用法:
+    python benchmarks/date_filters.py [--users 20] [--histories 10000,100000,500000] [--rounds 20]
+
+每个历史长度下新建数据库（使用main.init_database建表和执行迁移），
+目标用户有对应条数的历史记录，查询最近7天的数据。
+"""
+import os
+import sys
+import time
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='bench-'))
+
+import logging  # noqa: E402
+logging.disable(logging.INFO)
+
+import main  # noqa: E402
+from config import settings  # noqa: E402
+
+# 改写前的查询
+LEGACY_RANGE_SQL = (
+    "SELECT platform, username, follower_count, time FROM social_media "
+    "WHERE platform = ? AND username = ? AND date(time) >= date(?) ORDER BY time ASC"
+)
+
+
+def build_database(path, users, history):
+    """每个用户每10分钟一条记录，目标用户(twitter/target)有history条"""
+    if os.path.exists(path):
+        os.remove(path)
+    settings.db_path = path
+    asyncio.run(main.prepare_database())
+
+    now = datetime(2024, 6, 1)
+    conn = sqlite3.connect(path)
+    rows = []
+    for u in range(users):
+        username = 'target' if u == 0 else f'user{u}'
+        count = history if u == 0 else history // 10
+        for i in range(count):
+            t = now - timedelta(minutes=10 * i)
+            rows.append(('twitter', username, 1000 + i, t.strftime('%Y-%m-%d %H:%M:%S')))
+            if len(rows) >= 50000:
+                conn.executemany("INSERT INTO social_media (platform, username, follower_count, time) VALUES (?, ?, ?, ?)", rows)
+                rows = []
+    conn.executemany("INSERT INTO social_media (platform, username, follower_count, time) VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return (now - timedelta(days=7)).strftime('%Y-%m-%d')
+
+
+def plan(conn, sql, params):
+    return ' | '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+
+
+def best_time(conn, sql, params, rounds):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--histories', default='10000,100000,500000')
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(os.environ['DATA_DIR'], 'bench_date_filters.db')
+    for history in [int(h) for h in args.histories.split(',')]:
+        start_date = build_database(path, args.users, history)
+        conn = sqlite3.connect(path)
+        legacy_params = ('twitter', 'target', start_date)
+        params = main.range_params('twitter', 'target', start_date)
+
+        print(f"\ntarget history: {history} rows, range from {start_date}")
+        for label, sql, p in (
+            ('date(time)', LEGACY_RANGE_SQL, legacy_params),
+            ('range', main.USER_RANGE_SQL, params),
+            ('growth span', main.GROWTH_SPANNING_SQL, params),
+            ('growth first', main.GROWTH_FIRST_SQL, params),
+            ('growth last', main.GROWTH_LAST_SQL, params),
+            ('growth count', main.GROWTH_COUNT_SQL, params),
+        ):
+            elapsed = best_time(conn, sql, p, args.rounds)
+            print(f"  {label:>12}: {elapsed * 1000:8.3f} ms  {plan(conn, sql, p)}")
+
+        assert conn.execute(LEGACY_RANGE_SQL, legacy_params).fetchall() == \
+            conn.execute(main.USER_RANGE_SQL, params).fetchall()
+        conn.close()
+
+
+if __name__ == '__main__':
+    run()
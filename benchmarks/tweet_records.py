@@ -0,0 +1,146 @@
+"""
+对比gather_legacy_from_data两种输出模式的解析耗时和内存占用
+
+用法:
+    python benchmarks/tweet_records.py [--pages 50] [--per-page 20] [--rounds 5]
+
+dict模式返回修改过的原始legacy dict，结果引用整棵响应树；
+compact模式返回Tweet记录，解析后响应树可以被回收。
+"""
+import os
+import sys
+import gc
+import copy
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from twitter_api_python.utils import TwitterUtils  # noqa: E402
+
+
+def make_user(n):
+    """构造一个接近真实响应大小的用户result"""
+    return {
+        'rest_id': str(1000 + n),
+        'is_blue_verified': n % 3 == 0,
+        'legacy': {
+            'screen_name': f'user{n}',
+            'name': f'User {n}',
+            'description': 'bio ' * 30,
+            'profile_image_url_https': f'https://pbs.twimg.com/profile_images/{n}/a_normal.jpg',
+            'profile_banner_url': f'https://pbs.twimg.com/profile_banners/{n}/1',
+            'followers_count': n * 10,
+            'friends_count': n,
+            'statuses_count': n * 3,
+            'created_at': 'Mon Jan 01 00:00:00 +0000 2020',
+            'entities': {'description': {'urls': []}, 'url': {'urls': [{'expanded_url': 'https://example.com'}]}},
+            'pinned_tweet_ids_str': [str(n)],
+            'withheld_in_countries': [],
+        },
+        'professional': {'category': [{'id': 1, 'name': 'Tech'}]},
+        'affiliates_highlighted_label': {},
+    }
+
+
+def make_tweet(n, user):
+    return {
+        'rest_id': str(10 ** 9 + n),
+        'core': {'user_results': {'result': user}},
+        'views': {'count': str(n * 7), 'state': 'EnabledWithCount'},
+        'edit_control': {'edit_tweet_ids': [str(10 ** 9 + n)], 'editable_until_msecs': '0', 'edits_remaining': '5'},
+        'legacy': {
+            'full_text': f'tweet {n} ' + 'lorem ipsum ' * 15,
+            'created_at': 'Tue Feb 02 00:00:00 +0000 2021',
+            'lang': 'en',
+            'user_id_str': user['rest_id'],
+            'conversation_id_str': str(10 ** 9 + n),
+            'favorite_count': n, 'retweet_count': n // 2, 'reply_count': n // 3, 'quote_count': 0,
+            'entities': {
+                'hashtags': [{'text': 'python', 'indices': [0, 7]}],
+                'symbols': [],
+                'urls': [{'url': 'https://t.co/x', 'expanded_url': 'https://example.com/post', 'indices': [8, 20]}],
+                'user_mentions': [{'screen_name': 'someone', 'id_str': '42', 'indices': [21, 29]}],
+            },
+            'extended_entities': {'media': [{
+                'media_url_https': f'https://pbs.twimg.com/media/{n}.jpg',
+                'sizes': {size: {'w': 1200, 'h': 800, 'resize': 'fit'} for size in ('large', 'medium', 'small', 'thumb')},
+                'original_info': {'width': 1200, 'height': 800, 'focus_rects': [{'x': 0, 'y': 0, 'w': 1200, 'h': 672}] * 4},
+            }]},
+        },
+    }
+
+
+def make_pages(pages, per_page):
+    result = []
+    for p in range(pages):
+        entries = []
+        for i in range(per_page):
+            n = p * per_page + i
+            entries.append({
+                'entryId': f'tweet-{n}',
+                'sortIndex': str(n),
+                'content': {'itemContent': {'tweet_results': {'result': make_tweet(n, make_user(n % 50))}}},
+            })
+        entries.append({'entryId': 'cursor-bottom', 'content': {'cursorType': 'Bottom', 'value': f'c{p}'}})
+        result.append(entries)
+    return result
+
+
+def parse(utils, pages, compact):
+    tweets = []
+    for entries in pages:
+        tweets.extend(utils.gather_legacy_from_data(entries, compact=compact))
+    return tweets
+
+
+def measure_time(utils, template, compact):
+    """解析所有页的耗时（不开启tracemalloc，避免统计开销影响结果）"""
+    pages = copy.deepcopy(template)
+    gc.collect()
+    start = time.perf_counter()
+    parse(utils, pages, compact)
+    return time.perf_counter() - start
+
+
+def measure_memory(utils, template, compact):
+    """丢弃原始响应、只保留解析结果后仍占用的内存，返回 (字节数, 推文数)"""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    pages = copy.deepcopy(template)
+    tweets = parse(utils, pages, compact)
+
+    # 模拟调用方只保留解析结果
+    del pages
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return retained, len(tweets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--per-page', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    utils = TwitterUtils()
+    template = make_pages(args.pages, args.per_page)
+
+    print(f"{args.pages} pages x {args.per_page} tweets, best of {args.rounds} rounds")
+    for compact in (False, True):
+        elapsed = min(measure_time(utils, template, compact) for _ in range(args.rounds))
+        retained, count = measure_memory(utils, template, compact)
+        label = 'compact' if compact else 'dict'
+        print(f"{label:>8}: {count} tweets, parse {elapsed * 1000:8.1f} ms, "
+              f"retained {retained / 1024 / 1024:7.2f} MiB ({retained / max(count, 1):,.0f} B/tweet)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+import time
+import logging
+import threading
+from collections import deque
+from contextvars import ContextVar
+from typing import Optional
+from urllib.parse import urlparse
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 熔断器状态
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 当前任务中被熔断器拒绝的请求还需等待多久（秒）才会放行探测，没有请求被拒绝时为None；
+# 抓取调用方据此区分“熔断跳过”和真正的失败
+_short_circuited: ContextVar[Optional[float]] = ContextVar("short_circuited", default=None)
+
+
+def reset_short_circuit():
+    """开始一次抓取前清除当前任务的熔断跳过记录"""
+    _short_circuited.set(None)
+
+
+def short_circuit_retry_in() -> Optional[float]:
+    """当前任务自上次reset以来是否有请求被熔断器拒绝，返回到放行探测还需等待的秒数"""
+    return _short_circuited.get()
+
+
+def is_failure_status(status: int) -> bool:
+    """上游返回的状态码是否说明服务或代理出现问题（用户不存在等404不计入）"""
+    return status >= 500 or status in (401, 403, 429)
+
+
+class CircuitBreaker:
+    """熔断器：统计窗口内失败比例过高时断开，冷却后放行少量探测请求"""
+
+    def __init__(self, failure_ratio: float, min_calls: int, window: float,
+                 open_seconds: float, half_open_calls: int = 1):
+        """
+        Args:
+            failure_ratio: 触发熔断的失败比例
+            min_calls: 窗口内至少有这么多次调用才判断是否熔断
+            window: 统计窗口（秒）
+            open_seconds: 熔断后多久进入半开状态（秒）
+            half_open_calls: 半开状态下同时放行的探测请求数
+        """
+        self.failure_ratio = failure_ratio
+        self.min_calls = max(1, min_calls)
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_calls = max(1, half_open_calls)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probes = 0
+        self.rejected = 0
+        # 窗口内的调用结果 (时间, 是否成功)
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        while self._calls and self._calls[0][0] <= now - self.window:
+            self._calls.popleft()
+
+    def allow(self) -> bool:
+        """是否允许发出请求；熔断期间直接拒绝"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                if now - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self.opened_at = now
+                self.probes = 0
+            if self.state == HALF_OPEN:
+                # 探测请求迟迟没有结果时（例如调用方异常退出），冷却时间过后重新放行探测
+                if self.probes >= self.half_open_calls and now - self.opened_at >= self.open_seconds:
+                    self.opened_at = now
+                    self.probes = 0
+                if self.probes >= self.half_open_calls:
+                    self.rejected += 1
+                    return False
+                self.probes += 1
+            return True
+
+    def retry_in(self) -> float:
+        """距离下次放行探测请求的秒数"""
+        with self._lock:
+            if self.state == CLOSED:
+                return 0.0
+            return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                # 探测成功，恢复正常并重新开始统计
+                self.state = CLOSED
+                self._calls.clear()
+                return
+            now = time.monotonic()
+            self._calls.append((now, True))
+            self._prune(now)
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                self._trip(now)
+                return
+            if self.state == OPEN:
+                return
+            self._calls.append((now, False))
+            self._prune(now)
+            failures = sum(1 for _, ok in self._calls if not ok)
+            if len(self._calls) >= self.min_calls and failures / len(self._calls) >= self.failure_ratio:
+                self._trip(now)
+
+    def _trip(self, now: float):
+        self.state = OPEN
+        self.opened_at = now
+        self.probes = 0
+        self._calls.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            failures = sum(1 for _, ok in self._calls if not ok)
+            return {
+                "state": self.state,
+                "calls": len(self._calls),
+                "failures": failures,
+                "failure_ratio": round(failures / len(self._calls), 3) if self._calls else 0.0,
+                "rejected": self.rejected,
+                "retry_in_seconds": round(max(0.0, self.opened_at + self.open_seconds - now), 1)
+                if self.state == OPEN else 0.0,
+            }
+
+
+class CircuitBreakers:
+    """按平台和代理划分的熔断器集合"""
+
+    def __init__(self, failure_ratio: float, min_calls: int, window: float,
+                 open_seconds: float, half_open_calls: int = 1):
+        self.options = {
+            "failure_ratio": failure_ratio,
+            "min_calls": min_calls,
+            "window": window,
+            "open_seconds": open_seconds,
+            "half_open_calls": half_open_calls,
+        }
+        self.breakers = {}
+
+    def breaker(self, platform: str, proxy: Optional[str] = None) -> CircuitBreaker:
+        key = (platform, proxy)
+        if key not in self.breakers:
+            self.breakers[key] = CircuitBreaker(**self.options)
+        return self.breakers[key]
+
+    def allow(self, platform: str, proxy: Optional[str] = None) -> bool:
+        breaker = self.breaker(platform, proxy)
+        previous = breaker.state
+        allowed = breaker.allow()
+        if breaker.state != previous:
+            logger.info(f"Circuit for {platform} via {mask_proxy(proxy)} is half-open, probing upstream")
+        if not allowed:
+            retry_in = breaker.retry_in()
+            _short_circuited.set(max(retry_in, _short_circuited.get() or 0.0))
+        return allowed
+
+    def is_open(self, platform: str, proxy: Optional[str] = None) -> bool:
+        """熔断器是否断开且还没到放行探测的时间，只查询不改变状态"""
+        breaker = self.breakers.get((platform, proxy))
+        return breaker is not None and breaker.state == OPEN and breaker.retry_in() > 0
+
+    def record_success(self, platform: str, proxy: Optional[str] = None):
+        breaker = self.breaker(platform, proxy)
+        previous = breaker.state
+        breaker.record_success()
+        if breaker.state != previous:
+            logger.info(f"Circuit for {platform} via {mask_proxy(proxy)} closed")
+
+    def record_failure(self, platform: str, proxy: Optional[str] = None):
+        breaker = self.breaker(platform, proxy)
+        previous = breaker.state
+        breaker.record_failure()
+        if breaker.state == OPEN and previous != OPEN:
+            logger.warning(
+                f"Circuit for {platform} via {mask_proxy(proxy)} opened, "
+                f"short-circuiting requests for {breaker.open_seconds}s"
+            )
+
+    def record(self, platform: str, proxy: Optional[str] = None, status: Optional[int] = None):
+        """根据响应状态码记录一次调用结果，status为None表示请求异常或超时"""
+        if status is None or is_failure_status(status):
+            self.record_failure(platform, proxy)
+        else:
+            self.record_success(platform, proxy)
+
+    def for_platform(self, platform: str) -> "PlatformCircuitBreaker":
+        return PlatformCircuitBreaker(self, platform)
+
+    def snapshot(self) -> list:
+        return [
+            {"platform": platform, "proxy": mask_proxy(proxy), **breaker.snapshot()}
+            for (platform, proxy), breaker in self.breakers.items()
+        ]
+
+
+class PlatformCircuitBreaker:
+    """绑定到单个平台的熔断器，供twitter_api_python等只按代理区分的调用方使用"""
+
+    def __init__(self, breakers: CircuitBreakers, platform: str):
+        self.breakers = breakers
+        self.platform = platform
+
+    def allow(self, proxy: Optional[str] = None) -> bool:
+        return self.breakers.allow(self.platform, proxy)
+
+    def record(self, proxy: Optional[str] = None, status: Optional[int] = None):
+        self.breakers.record(self.platform, proxy, status)
+
+
+def mask_proxy(proxy: Optional[str]) -> str:
+    """隐藏代理地址中的账号密码"""
+    if not proxy:
+        return "direct"
+    parsed = urlparse(proxy)
+    if parsed.hostname is None:
+        return proxy
+    port = f":{parsed.port}" if parsed.port else ""
+    return f"{parsed.scheme}://{parsed.hostname}{port}"
+
+
+# 全局熔断器实例
+circuit_breakers = CircuitBreakers(
+    failure_ratio=settings.circuit_failure_ratio,
+    min_calls=settings.circuit_min_calls,
+    window=settings.circuit_window,
+    open_seconds=settings.circuit_open_seconds,
+    half_open_calls=settings.circuit_half_open_calls,
+)
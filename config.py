@@ -18,13 +18,78 @@ class Settings(BaseSettings):
     # 数据库配置
     data_dir: str = "./data"
     db_path: str = "./data.db"
+    db_read_connections: int = 4  # 连接池中的只读连接数，写入统一使用一个写连接
+    db_synchronous: str = "NORMAL"  # WAL模式下NORMAL不会损坏数据库，只可能在断电时丢失最后的事务
+    db_cache_size_mb: int = 32  # 每个连接的页缓存大小（MB）
+    db_mmap_size_mb: int = 256  # 内存映射读取的大小（MB），0表示不使用
+    db_busy_timeout: int = 5000  # 等待其他进程（如独立worker）释放写锁的时间（毫秒）
+    
+    # 粉丝数写入缓冲：攒够一批或到达间隔时在一个事务中批量写入
+    sample_batch_size: int = 500  # 每批最多写入的数据条数
+    sample_flush_interval: float = 1.0  # 数据在缓冲区中最多停留的时间（秒）
+    sample_queue_size: int = 10000  # 缓冲区上限，写满时抓取协程等待写入
+    # 存储模式：full - 每次采样插入一条记录；rle - 粉丝数没有变化时只延长上一条记录的last_seen，表大小只与变化次数有关
+    sample_storage: str = "full"
     
     # 代理配置
     http_proxy: Optional[str] = None
     https_proxy: Optional[str] = None
     
+    # 代理池：逗号分隔的多个代理地址，配置后按延迟和错误率轮换使用，替代http_proxy/https_proxy
+    proxy_pool: str = ""
+    proxy_eviction_seconds: int = 120  # 错误率过高的代理暂时移出的时间（秒）
+    proxy_error_threshold: float = 0.5  # 移出代理的错误率阈值
+    proxy_min_samples: int = 5  # 至少这么多次请求后才判断是否移出
+    
+    # HTTP客户端配置
+    http_pool_size: int = 100  # 连接池最大连接数
+    http_pool_size_per_host: int = 20  # 每个主机的最大连接数
+    http_dns_cache_ttl: int = 300  # DNS缓存时间（秒）
+    http_keepalive_timeout: int = 30  # 空闲连接保持时间（秒）
+    
     # 定时任务配置
     fetch_interval: int = 10  # 分钟
+    enable_scheduler: bool = True  # API进程是否同时运行调度器，由独立worker抓取时设为False
+    
+    instagram_fetch_concurrency: int = 5  # 每个周期同时抓取的Instagram用户数
+    twitter_fetch_concurrency: int = 3  # 每个周期同时抓取的Twitter用户数
+    twitter_batch_size: int = 50  # 每次批量查询的Twitter用户数，1表示逐个查询
+    
+    # 调度模式：burst - 每个周期同时抓取所有用户；spread - 把用户的抓取时间均匀分散到整个周期
+    schedule_mode: str = "burst"
+    schedule_jitter: float = 0.1  # spread模式下抓取间隔的随机抖动比例
+    
+    # 自适应抓取：根据每个用户粉丝数的变化频率调整抓取间隔
+    adaptive_polling: bool = False
+    min_fetch_interval: float = 5  # 最短抓取间隔（分钟）
+    max_fetch_interval: float = 60  # 最长抓取间隔（分钟）
+    polling_history_size: int = 12  # 计算变化频率使用的最近采样数
+    scheduler_tick: int = 30  # 按用户调度时检查到期用户的周期（秒）
+    
+    # 抓取任务队列配置
+    queue_poll_interval: int = 5  # 检查队列中到期任务的周期（秒）
+    queue_claim_size: int = 200  # 每次最多领取的任务数
+    queue_max_attempts: int = 5  # 任务最多尝试次数，超过后进入死信状态
+    queue_backoff_base: int = 10  # 首次重试等待时间（秒），之后每次翻倍
+    queue_backoff_max: int = 600  # 重试等待时间上限（秒）
+    queue_retention_hours: int = 24  # 已完成/死信任务的保留时间（小时）
+    queue_lease_ttl: int = 600  # 领取任务后的租约时间（秒），节点崩溃后超时由其他节点重新领取
+    
+    # 多副本部署：通过数据库租约选出负责入队的主节点
+    leader_lease_ttl: int = 60  # 主节点租约时间（秒）
+    
+    # 限流配置（每分钟请求数 / 突发容量），Twitter按每个凭证单独计算，Instagram按每个出口代理单独计算
+    instagram_rate_limit: float = 60
+    instagram_rate_burst: int = 10
+    twitter_rate_limit: float = 30
+    twitter_rate_burst: int = 10
+    
+    # 熔断配置：按平台和代理统计，窗口内失败比例过高时暂停请求，冷却后放行探测请求
+    circuit_failure_ratio: float = 0.5  # 触发熔断的失败比例
+    circuit_min_calls: int = 10  # 窗口内至少这么多次调用才判断是否熔断
+    circuit_window: int = 60  # 统计窗口（秒）
+    circuit_open_seconds: int = 60  # 熔断后多久放行探测请求（秒）
+    circuit_half_open_calls: int = 1  # 半开状态下同时放行的探测请求数
     
     # 日志配置
     log_level: str = "INFO"
@@ -35,6 +100,8 @@ class Settings(BaseSettings):
     
     # Twitter API配置
     twitter_auth_token: Optional[str] = None
+    twitter_auth_tokens: str = ""  # 逗号分隔的多个认证token，和twitter_auth_token一起组成凭证池
+    twitter_credential_quarantine: int = 900  # 连续认证失败的token被隔离的时间（秒）
     
     class Config:
         env_file = ".env"
@@ -72,6 +139,18 @@ class Settings(BaseSettings):
         if self.https_proxy:
             config["https"] = self.https_proxy
         return config
+    
+    @property
+    def twitter_auth_token_list(self) -> list:
+        """获取所有Twitter认证token（去重，保持顺序）"""
+        tokens = [self.twitter_auth_token] if self.twitter_auth_token else []
+        tokens += [token.strip() for token in self.twitter_auth_tokens.split(",") if token.strip()]
+        return list(dict.fromkeys(tokens))
+    
+    @property
+    def proxy_pool_urls(self) -> list:
+        """获取代理池中的代理地址列表"""
+        return [url.strip() for url in self.proxy_pool.split(",") if url.strip()]
 
 # 全局配置实例
 settings = Settings() 
\ No newline at end of file
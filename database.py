@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import aiosqlite
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def connection_pragmas(readonly: bool = False) -> list:
+    """每个连接打开后执行的PRAGMA"""
+    synchronous = settings.db_synchronous.upper()
+    if synchronous not in SYNCHRONOUS_MODES:
+        synchronous = "NORMAL"
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(settings.db_busy_timeout)}",
+        f"PRAGMA synchronous = {synchronous}",
+        # 负数表示按KiB计算
+        f"PRAGMA cache_size = -{int(settings.db_cache_size_mb) * 1024}",
+        f"PRAGMA mmap_size = {int(settings.db_mmap_size_mb) * 1024 * 1024}",
+        "PRAGMA temp_store = MEMORY",
+    ]
+    if readonly:
+        pragmas.append("PRAGMA query_only = ON")
+    return pragmas
+
+
+class DatabasePool:
+    """长期保持的SQLite连接：一个写连接和多个只读连接
+
+    数据库使用WAL模式，读连接读取快照，不会阻塞写入，写入也不会阻塞读取；
+    所有写事务通过同一个写连接串行执行，避免多个连接互相等待写锁。
+    """
+
+    def __init__(self, path: str, read_connections: int):
+        self.path = path
+        self.read_connections = max(1, read_connections)
+        self._writer = None
+        self._readers = []
+        self._idle = None
+        self._write_lock = None
+
+    async def _connect(self, readonly: bool = False) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(self.path)
+        for pragma in connection_pragmas(readonly):
+            await db.execute(pragma)
+        return db
+
+    async def open(self):
+        self._writer = await self._connect()
+        # WAL模式记录在数据库文件中，只需要在写连接上设置一次
+        cursor = await self._writer.execute("PRAGMA journal_mode = WAL")
+        journal_mode = (await cursor.fetchone())[0]
+        if journal_mode.lower() != "wal":
+            logger.warning(f"SQLite journal mode is {journal_mode}, WAL not available")
+
+        self._readers = [await self._connect(readonly=True) for _ in range(self.read_connections)]
+        self._idle = asyncio.Queue()
+        for db in self._readers:
+            self._idle.put_nowait(db)
+        self._write_lock = asyncio.Lock()
+        logger.info(f"Database pool opened ({self.read_connections} readers, journal mode {journal_mode})")
+
+    @asynccontextmanager
+    async def write(self):
+        """获取写连接，退出前未提交的事务会被回滚"""
+        async with self._write_lock:
+            try:
+                yield self._writer
+            finally:
+                if self._writer.in_transaction:
+                    await self._writer.rollback()
+
+    @asynccontextmanager
+    async def read(self):
+        """获取一个只读连接，所有读连接都在使用时等待"""
+        db = await self._idle.get()
+        try:
+            yield db
+        finally:
+            if db.in_transaction:
+                await db.rollback()
+            self._idle.put_nowait(db)
+
+    async def close(self):
+        for db in [self._writer, *self._readers]:
+            if db is not None:
+                await db.close()
+        self._writer = None
+        self._readers = []
+
+
+# 全局共享的数据库连接池，在应用启动时创建，关闭时释放
+_pool: Optional[DatabasePool] = None
+_start_lock: Optional[asyncio.Lock] = None
+_sync_connections = threading.local()
+
+
+async def start_database() -> DatabasePool:
+    """创建共享的数据库连接池；db_path变化时（例如测试中）重新创建"""
+    global _pool, _start_lock
+    if _start_lock is None:
+        _start_lock = asyncio.Lock()
+    async with _start_lock:
+        if _pool is not None and _pool.path != settings.db_path:
+            await close_database()
+        if _pool is None:
+            pool = DatabasePool(settings.db_path, settings.db_read_connections)
+            await pool.open()
+            _pool = pool
+    return _pool
+
+
+async def get_database() -> DatabasePool:
+    """获取共享的数据库连接池，未启动时自动创建"""
+    if _pool is None or _pool.path != settings.db_path:
+        return await start_database()
+    return _pool
+
+
+async def close_database():
+    """关闭共享的数据库连接池"""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
+        logger.info("Database pool closed")
+
+
+@asynccontextmanager
+async def db_write():
+    """从连接池获取写连接"""
+    pool = await get_database()
+    async with pool.write() as db:
+        yield db
+
+
+@asynccontextmanager
+async def db_read():
+    """从连接池获取只读连接"""
+    pool = await get_database()
+    async with pool.read() as db:
+        yield db
+
+
+def connect_sync() -> sqlite3.Connection:
+    """获取当前线程复用的同步连接，供无法使用异步接口的代码（如rest_id存储）使用"""
+    conn = getattr(_sync_connections, "conn", None)
+    if conn is None or _sync_connections.path != settings.db_path:
+        if conn is not None:
+            conn.close()
+        conn = sqlite3.connect(settings.db_path)
+        for pragma in connection_pragmas():
+            conn.execute(pragma)
+        _sync_connections.conn = conn
+        _sync_connections.path = settings.db_path
+    return conn
+
+
+async def ensure_column(db, table: str, column: str, definition: str):
+    """如果表中不存在指定列则添加"""
+    cursor = await db.execute(f"PRAGMA table_info({table})")
+    columns = [row[1] for row in await cursor.fetchall()]
+    if column not in columns:
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        logger.info(f"Added column {table}.{column}")
+
+
+# 数据库迁移：(版本号, 说明, SQL语句列表)，按版本号顺序执行
+# 当前版本记录在 PRAGMA user_version 中；已发布的迁移不要修改，只能追加新版本
+MIGRATIONS = [
+    (1, "index social_media by user and time", [
+        # 按用户查询时间序列（/api/followers、图表、增长统计）走索引范围扫描，不再全表扫描
+        "CREATE INDEX IF NOT EXISTS idx_social_media_user_time ON social_media (platform, username, time)",
+        # 收集索引统计信息，只按用户名过滤时查询计划器也能通过skip-scan使用该索引
+        "ANALYZE social_media",
+    ]),
+    (2, "normalize social_media timestamps", [
+        # 统一为 YYYY-MM-DD HH:MM:SS（UTC），时间范围条件可以直接按字符串比较 time 列
+        """
+        UPDATE social_media SET time = datetime(time)
+        WHERE datetime(time) IS NOT NULL AND time != datetime(time)
+        """,
+    ]),
+    (3, "run-length encoded follower samples", [
+        # 粉丝数没有变化时只延长上一条记录：last_seen为最后一次采样时间，samples为合并的采样次数
+        "ALTER TABLE social_media ADD COLUMN last_seen TIMESTAMP",
+        "ALTER TABLE social_media ADD COLUMN samples INTEGER NOT NULL DEFAULT 1",
+        """
+        CREATE INDEX IF NOT EXISTS idx_social_media_user_last_seen
+        ON social_media (platform, username, last_seen) WHERE last_seen IS NOT NULL
+        """,
+        # 读取时把每条记录展开为首尾两个采样点，未合并的记录只有一个采样点
+        """
+        CREATE VIEW IF NOT EXISTS follower_samples AS
+        SELECT id, platform, username, follower_count, time FROM social_media
+        UNION ALL
+        SELECT id, platform, username, follower_count, last_seen AS time FROM social_media
+        WHERE last_seen IS NOT NULL AND last_seen > time
+        """,
+    ]),
+]
+
+
+# 表的行数超过上次ANALYZE时的该倍数时重新收集统计信息，数据量翻倍才重新扫描一次全表
+ANALYZE_GROWTH_FACTOR = 2
+
+
+async def refresh_statistics(db, table: str = "social_media") -> bool:
+    """表从未收集过统计信息或数据量明显增长时重新ANALYZE，返回是否执行了ANALYZE
+
+    迁移中的ANALYZE在新安装的空表上收集不到统计信息，查询计划器在只按用户名过滤时
+    不会对(platform, username, time)索引使用skip-scan，因此启动时和定期检查一次。
+    """
+    cursor = await db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+    analyzed_rows = 0
+    if await cursor.fetchone():
+        cursor = await db.execute("SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = ?", (table,))
+        analyzed_rows = (await cursor.fetchone())[0] or 0
+
+    # 自增主键的最大值近似表的行数，不需要扫描整张表
+    cursor = await db.execute(f"SELECT MAX(rowid) FROM {table}")
+    rows = (await cursor.fetchone())[0] or 0
+    if not rows or (analyzed_rows and rows < analyzed_rows * ANALYZE_GROWTH_FACTOR):
+        return False
+
+    await db.execute(f"ANALYZE {table}")
+    await db.commit()
+    logger.info(f"Analyzed {table} (about {rows} rows, previously {analyzed_rows})")
+    return True
+
+
+async def get_schema_version(db) -> int:
+    cursor = await db.execute("PRAGMA user_version")
+    return (await cursor.fetchone())[0]
+
+
+async def run_migrations(db, migrations: list = MIGRATIONS) -> int:
+    """执行尚未应用的迁移，返回迁移后的版本号
+
+    每个迁移在单独的事务中执行并同时更新user_version，失败时回滚，不会留下执行了一半的迁移。
+    多个副本同时启动时，BEGIN IMMEDIATE保证同一迁移只执行一次。
+    """
+    version = await get_schema_version(db)
+    for target, description, statements in sorted(migrations, key=lambda m: m[0]):
+        if target <= version:
+            continue
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            # 等待写锁期间其他节点可能已经完成了迁移
+            version = await get_schema_version(db)
+            if target <= version:
+                await db.rollback()
+                continue
+            for statement in statements:
+                await db.execute(statement)
+            await db.execute(f"PRAGMA user_version = {int(target)}")
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            logger.error(f"Database migration {target} ({description}) failed")
+            raise
+        version = target
+        logger.info(f"Applied database migration {target}: {description}")
+    return version
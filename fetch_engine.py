@@ -0,0 +1,94 @@
+import asyncio
+import time
+import logging
+from datetime import datetime
+
+from circuit_breaker import reset_short_circuit, short_circuit_retry_in
+
+logger = logging.getLogger(__name__)
+
+# 每个平台最近一次抓取周期的统计信息
+last_cycle_stats = {}
+
+
+async def run_fetch_cycle(platform: str, usernames: list, fetch_func, concurrency: int,
+                          batch_func=None, batch_size: int = 1):
+    """并发抓取一批用户，返回本周期的统计信息
+
+    Args:
+        platform: 平台名称
+        usernames: 需要抓取的用户名列表
+        fetch_func: 抓取单个用户的协程函数，失败时返回None或抛出异常
+        concurrency: 同时进行的最大抓取数
+        batch_func: 可选，一次抓取多个用户的协程函数，返回 {用户名: 结果}；
+            提供时按batch_size分组抓取，每组占用一个并发名额
+        batch_size: 每组的用户数
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    failed_users = []
+    # 请求被熔断器直接拒绝的用户：没有真正调用上游，不算失败
+    skipped_users = []
+    retry_in = []
+
+    def record_missing(usernames):
+        waiting = short_circuit_retry_in()
+        if waiting is None:
+            failed_users.extend(usernames)
+        else:
+            skipped_users.extend(usernames)
+            retry_in.append(waiting)
+
+    async def fetch_one(username):
+        async with semaphore:
+            # 每个抓取在单独的任务中执行，熔断记录只反映本次抓取
+            reset_short_circuit()
+            try:
+                result = await fetch_func(username)
+            except Exception as e:
+                logger.error(f"Error fetching {platform} data for {username}: {e}")
+                result = None
+            if result is None:
+                record_missing([username])
+            return result
+
+    async def fetch_batch(batch):
+        async with semaphore:
+            reset_short_circuit()
+            try:
+                results = await batch_func(batch)
+            except Exception as e:
+                logger.error(f"Error fetching {platform} data for batch of {len(batch)}: {e}")
+                results = {}
+            record_missing([username for username in batch if results.get(username) is None])
+
+    started_at = datetime.now()
+    start = time.monotonic()
+    if batch_func is not None and batch_size > 1:
+        batches = [usernames[i:i + batch_size] for i in range(0, len(usernames), batch_size)]
+        await asyncio.gather(*(fetch_batch(batch) for batch in batches))
+    else:
+        await asyncio.gather(*(fetch_one(username) for username in usernames))
+    duration = time.monotonic() - start
+
+    stats = {
+        "platform": platform,
+        "started_at": started_at.isoformat(),
+        "duration_seconds": round(duration, 3),
+        "concurrency": concurrency,
+        "total": len(usernames),
+        "success": len(usernames) - len(failed_users) - len(skipped_users),
+        "failed": len(failed_users),
+        "failed_users": failed_users,
+        "skipped": len(skipped_users),
+        "skipped_users": skipped_users,
+        "retry_in_seconds": round(max(retry_in), 1) if retry_in else 0.0,
+    }
+    last_cycle_stats[platform] = stats
+
+    logger.info(
+        f"{platform} fetch cycle finished in {duration:.2f}s: "
+        f"{stats['success']}/{stats['total']} succeeded, {stats['failed']} failed, "
+        f"{stats['skipped']} skipped by open circuits "
+        f"(concurrency={concurrency})"
+    )
+    return stats
@@ -0,0 +1,57 @@
+import logging
+from typing import Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 全局共享的HTTP会话，在应用启动时创建，关闭时释放
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_proxy(url: str) -> Optional[str]:
+    """根据目标URL的协议从代理配置中选择代理"""
+    proxies = settings.proxy_config
+    if not proxies:
+        return None
+    scheme = urlparse(url).scheme
+    return proxies.get(scheme) or proxies.get("http")
+
+
+async def start_http_client() -> aiohttp.ClientSession:
+    """创建共享的HTTP会话（连接池 + DNS缓存）"""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=settings.http_pool_size,
+            limit_per_host=settings.http_pool_size_per_host,
+            ttl_dns_cache=settings.http_dns_cache_ttl,
+            keepalive_timeout=settings.http_keepalive_timeout,
+        )
+        # 不在共享会话中保存cookies，避免不同账号/站点之间互相串用
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=30),
+            cookie_jar=aiohttp.DummyCookieJar(),
+        )
+        logger.info(f"HTTP client started (pool size {settings.http_pool_size})")
+    return _session
+
+
+async def get_http_client() -> aiohttp.ClientSession:
+    """获取共享的HTTP会话，未启动时自动创建"""
+    if _session is None or _session.closed:
+        return await start_http_client()
+    return _session
+
+
+async def close_http_client():
+    """关闭共享的HTTP会话"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logger.info("HTTP client closed")
+    _session = None
@@ -0,0 +1,301 @@
+import math
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from config import settings
+from database import ensure_column, db_read, db_write
+from leases import NODE_ID
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+DEAD = "dead"
+
+
+async def init_job_queue(db):
+    """创建抓取任务队列表"""
+    await db.execute('''
+    CREATE TABLE IF NOT EXISTS fetch_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        platform TEXT NOT NULL,
+        username TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        next_run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        enqueued_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP,
+        last_error TEXT,
+        lease_owner TEXT,
+        lease_expires_at TIMESTAMP
+    );''')
+    # 多副本部署：记录任务由哪个节点领取以及租约到期时间
+    await ensure_column(db, "fetch_jobs", "lease_owner", "TEXT")
+    await ensure_column(db, "fetch_jobs", "lease_expires_at", "TIMESTAMP")
+    await db.execute('''
+    CREATE INDEX IF NOT EXISTS idx_fetch_jobs_status
+    ON fetch_jobs (status, platform, next_run_at);''')
+    # 同一用户同时只能有一个未完成的任务，重复入队会被忽略
+    await db.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_fetch_jobs_active
+    ON fetch_jobs (platform, username) WHERE status IN ('pending', 'running');''')
+
+
+async def enqueue_jobs(platform: str, usernames: list) -> int:
+    """把需要抓取的用户加入队列，返回实际新增的任务数"""
+    if not usernames:
+        return 0
+    async with db_write() as db:
+        before = db.total_changes
+        await db.executemany(
+            "INSERT OR IGNORE INTO fetch_jobs (platform, username, max_attempts) VALUES (?, ?, ?)",
+            [(platform, username, settings.queue_max_attempts) for username in usernames]
+        )
+        await db.commit()
+        return db.total_changes - before
+
+
+async def claim_jobs(platform: str, limit: int, owner: str = NODE_ID) -> list:
+    """领取已到执行时间的任务，标记为执行中
+
+    任务在queue_lease_ttl秒内归领取的节点所有；节点崩溃后租约过期，
+    任务会被其他节点重新领取，多个副本之间不会重复抓取同一用户。
+    没有租约到期时间的执行中任务（旧版本遗留）视为租约已过期。
+    """
+    async with db_write() as db:
+        # 立即获取写锁，避免多个节点并发领取到同一批任务
+        await db.execute("BEGIN IMMEDIATE")
+        cursor = await db.execute(
+            """
+            SELECT id, username, attempts, status FROM fetch_jobs
+            WHERE platform = ?
+              AND ((status = ? AND next_run_at <= datetime('now'))
+                   OR (status = ? AND (lease_expires_at IS NULL OR lease_expires_at <= datetime('now'))))
+            ORDER BY next_run_at, id
+            LIMIT ?
+            """,
+            (platform, PENDING, RUNNING, limit)
+        )
+        jobs = []
+        dead = []
+        for job_id, username, attempts, status in await cursor.fetchall():
+            if status == RUNNING:
+                # 租约过期被重新领取的任务上一次执行没有结果，计为一次尝试
+                attempts += 1
+                if attempts >= settings.queue_max_attempts:
+                    dead.append((DEAD, attempts, "Lease expired", job_id))
+                    continue
+            jobs.append({"id": job_id, "username": username, "attempts": attempts})
+        if dead:
+            await db.executemany(
+                """
+                UPDATE fetch_jobs
+                SET status = ?, attempts = ?, finished_at = datetime('now'), last_error = ?, lease_owner = NULL
+                WHERE id = ?
+                """,
+                dead
+            )
+            logger.warning(f"{len(dead)} {platform} fetch jobs moved to dead letter after repeated lease expiry")
+        if jobs:
+            await db.executemany(
+                """
+                UPDATE fetch_jobs
+                SET status = ?, attempts = ?, started_at = datetime('now'), lease_owner = ?,
+                    lease_expires_at = datetime('now', ?)
+                WHERE id = ?
+                """,
+                [(RUNNING, job["attempts"], owner, f"+{settings.queue_lease_ttl} seconds", job["id"]) for job in jobs]
+            )
+        await db.commit()
+        return jobs
+
+
+async def renew_job_leases(jobs: list, owner: str = NODE_ID) -> int:
+    """延长仍由当前节点持有的任务租约，返回续期的任务数"""
+    if not jobs:
+        return 0
+    async with db_write() as db:
+        before = db.total_changes
+        await db.executemany(
+            "UPDATE fetch_jobs SET lease_expires_at = datetime('now', ?) WHERE id = ? AND status = ? AND lease_owner = ?",
+            [(f"+{settings.queue_lease_ttl} seconds", job["id"], RUNNING, owner) for job in jobs]
+        )
+        await db.commit()
+        return db.total_changes - before
+
+
+async def _renew_job_leases_periodically(jobs: list, owner: str):
+    interval = max(1, settings.queue_lease_ttl // 3)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            renewed = await renew_job_leases(jobs, owner)
+            if renewed < len(jobs):
+                logger.warning(f"Lost the lease on {len(jobs) - renewed}/{len(jobs)} fetch jobs")
+        except Exception as e:
+            logger.error(f"Error renewing fetch job leases: {e}")
+
+
+@asynccontextmanager
+async def holding_job_leases(jobs: list, owner: str = NODE_ID):
+    """执行期间每隔三分之一租约时间续期一次，批次被限流拖慢时任务不会被其他节点重新领取"""
+    task = asyncio.create_task(_renew_job_leases_periodically(jobs, owner))
+    try:
+        yield
+    finally:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+async def complete_jobs(jobs: list, owner: str = NODE_ID):
+    """标记任务成功完成"""
+    if not jobs:
+        return
+    async with db_write() as db:
+        # 只更新仍由当前节点持有的任务，租约过期后已被其他节点接管的任务不受影响
+        await db.executemany(
+            """
+            UPDATE fetch_jobs SET status = ?, finished_at = datetime('now'), last_error = NULL, lease_owner = NULL
+            WHERE id = ? AND lease_owner = ?
+            """,
+            [(DONE, job["id"], owner) for job in jobs]
+        )
+        await db.commit()
+
+
+async def defer_jobs(jobs: list, delay: float, reason: str, owner: str = NODE_ID):
+    """把没有执行的任务放回队列，delay秒后重新领取，不增加尝试次数（例如熔断器断开时跳过的任务）"""
+    if not jobs:
+        return
+    async with db_write() as db:
+        await db.executemany(
+            """
+            UPDATE fetch_jobs
+            SET status = ?, next_run_at = datetime('now', ?), last_error = ?, lease_owner = NULL
+            WHERE id = ? AND lease_owner = ?
+            """,
+            [(PENDING, f"+{max(1, math.ceil(delay))} seconds", reason, job["id"], owner) for job in jobs]
+        )
+        await db.commit()
+
+
+def backoff_seconds(attempts: int) -> int:
+    """第attempts次失败后的重试等待时间（指数退避）"""
+    return min(settings.queue_backoff_base * 2 ** (attempts - 1), settings.queue_backoff_max)
+
+
+async def fail_jobs(jobs: list, error: str, owner: str = NODE_ID) -> list:
+    """记录任务失败：未超过最大次数时按指数退避重新排队，否则进入死信状态
+
+    Returns:
+        进入死信状态的任务
+    """
+    dead = []
+    if not jobs:
+        return dead
+    async with db_write() as db:
+        for job in jobs:
+            attempts = job["attempts"] + 1
+            if attempts >= settings.queue_max_attempts:
+                dead.append(job)
+                await db.execute(
+                    """
+                    UPDATE fetch_jobs
+                    SET status = ?, attempts = ?, finished_at = datetime('now'), last_error = ?, lease_owner = NULL
+                    WHERE id = ? AND lease_owner = ?
+                    """,
+                    (DEAD, attempts, error, job["id"], owner)
+                )
+            else:
+                await db.execute(
+                    """
+                    UPDATE fetch_jobs
+                    SET status = ?, attempts = ?, next_run_at = datetime('now', ?), last_error = ?, lease_owner = NULL
+                    WHERE id = ? AND lease_owner = ?
+                    """,
+                    (PENDING, attempts, f"+{backoff_seconds(attempts)} seconds", error, job["id"], owner)
+                )
+        await db.commit()
+
+    if dead:
+        logger.warning(f"{len(dead)} fetch jobs moved to dead letter: {[job['username'] for job in dead]}")
+    return dead
+
+
+async def purge_finished_jobs() -> int:
+    """删除超过保留时间的已完成任务和死信任务"""
+    async with db_write() as db:
+        cursor = await db.execute(
+            "DELETE FROM fetch_jobs WHERE status IN (?, ?) AND finished_at <= datetime('now', ?)",
+            (DONE, DEAD, f"-{settings.queue_retention_hours} hours")
+        )
+        await db.commit()
+        return cursor.rowcount
+
+
+async def get_queue_stats() -> dict:
+    """获取队列深度、延迟和死信统计"""
+    async with db_read() as db:
+        cursor = await db.execute(
+            "SELECT platform, status, COUNT(*) FROM fetch_jobs GROUP BY platform, status"
+        )
+        depth = {}
+        for platform, status, count in await cursor.fetchall():
+            depth.setdefault(platform, {})[status] = count
+
+        # 已到期但还未被领取的任务数和最大等待时间（秒）
+        cursor = await db.execute(
+            """
+            SELECT platform, COUNT(*),
+                   MAX((julianday('now') - julianday(next_run_at)) * 86400)
+            FROM fetch_jobs
+            WHERE status = ? AND next_run_at <= datetime('now')
+            GROUP BY platform
+            """,
+            (PENDING,)
+        )
+        due = {
+            row[0]: {"due": row[1], "lag_seconds": round(row[2] or 0, 1)}
+            for row in await cursor.fetchall()
+        }
+
+        cursor = await db.execute(
+            """
+            SELECT id, platform, username, attempts, last_error, finished_at
+            FROM fetch_jobs WHERE status = ?
+            ORDER BY finished_at DESC LIMIT 20
+            """,
+            (DEAD,)
+        )
+        dead_jobs = [
+            {
+                "id": row[0],
+                "platform": row[1],
+                "username": row[2],
+                "attempts": row[3],
+                "last_error": row[4],
+                "finished_at": row[5],
+            }
+            for row in await cursor.fetchall()
+        ]
+
+    platforms = set(depth) | set(due)
+    return {
+        "platforms": {
+            platform: {
+                "depth": depth.get(platform, {}),
+                "due": due.get(platform, {}).get("due", 0),
+                "lag_seconds": due.get(platform, {}).get("lag_seconds", 0.0),
+            }
+            for platform in sorted(platforms)
+        },
+        "recent_dead_jobs": dead_jobs,
+    }
@@ -0,0 +1,102 @@
+import os
+import time
+import uuid
+import socket
+import logging
+
+from config import settings
+from database import db_read, db_write
+
+logger = logging.getLogger(__name__)
+
+# 当前进程的唯一标识，用于租约和任务领取
+NODE_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+# 调度主节点租约名称
+LEADER_LEASE = "dispatcher"
+
+# 当前进程是否持有调度主节点租约
+_is_leader = False
+
+
+async def init_leases(db):
+    """创建租约表"""
+    await db.execute('''
+    CREATE TABLE IF NOT EXISTS scheduler_leases (
+        name TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );''')
+
+
+async def acquire_lease(name: str, ttl: float, owner: str = NODE_ID) -> bool:
+    """获取或续期租约，租约由其他节点持有且未过期时返回False"""
+    now = time.time()
+    async with db_write() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        await db.execute(
+            """
+            INSERT INTO scheduler_leases (name, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE scheduler_leases.owner = excluded.owner OR scheduler_leases.expires_at <= ?
+            """,
+            (name, owner, now + ttl, now)
+        )
+        cursor = await db.execute("SELECT owner FROM scheduler_leases WHERE name = ?", (name,))
+        row = await cursor.fetchone()
+        await db.commit()
+        return row is not None and row[0] == owner
+
+
+async def release_lease(name: str, owner: str = NODE_ID):
+    """主动释放租约，其他节点可以立即接管"""
+    async with db_write() as db:
+        await db.execute("DELETE FROM scheduler_leases WHERE name = ? AND owner = ?", (name, owner))
+        await db.commit()
+
+
+async def renew_leadership() -> bool:
+    """续期调度主节点租约，只有主节点负责把用户加入抓取队列"""
+    global _is_leader
+    try:
+        leader = await acquire_lease(LEADER_LEASE, settings.leader_lease_ttl)
+    except Exception as e:
+        logger.error(f"Error renewing scheduler leadership: {e}")
+        leader = False
+
+    if leader != _is_leader:
+        if leader:
+            logger.info(f"Node {NODE_ID} became scheduler leader")
+        else:
+            logger.info(f"Node {NODE_ID} lost scheduler leadership")
+    _is_leader = leader
+    return leader
+
+
+def is_leader() -> bool:
+    """当前进程是否为调度主节点"""
+    return _is_leader
+
+
+async def resign_leadership():
+    """进程退出时释放主节点租约"""
+    global _is_leader
+    if _is_leader:
+        await release_lease(LEADER_LEASE)
+        _is_leader = False
+
+
+async def get_leases() -> list:
+    """获取所有租约的持有者和剩余时间"""
+    now = time.time()
+    async with db_read() as db:
+        cursor = await db.execute("SELECT name, owner, expires_at FROM scheduler_leases ORDER BY name")
+        return [
+            {
+                "name": row[0],
+                "owner": row[1],
+                "expires_in_seconds": round(row[2] - now, 1),
+                "active": row[2] > now,
+            }
+            for row in await cursor.fetchall()
+        ]
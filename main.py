@@ -1,5 +1,6 @@
 import asyncio
-import aiosqlite
+import time
+import aiohttp
 import sqlite3
 import pandas as pd
 import matplotlib
@@ -8,7 +9,6 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import seaborn as sns
-import requests
 import json
 from io import BytesIO
 import base64
@@ -26,6 +26,21 @@ from apscheduler.triggers.interval import IntervalTrigger
 import logging
 
 from config import settings
+from fetch_engine import run_fetch_cycle, last_cycle_stats
+from http_client import start_http_client, get_http_client, close_http_client
+from rate_limiter import rate_limiter
+from circuit_breaker import circuit_breakers
+from proxy_pool import proxy_pool, select_proxy
+from polling import compute_poll_interval, spread_offsets, jittered_interval
+from database import (
+    ensure_column, run_migrations, refresh_statistics, start_database, close_database, db_read, db_write, connect_sync
+)
+from job_queue import (
+    init_job_queue, enqueue_jobs, claim_jobs, holding_job_leases, complete_jobs, fail_jobs, defer_jobs,
+    purge_finished_jobs, get_queue_stats
+)
+from sample_writer import sample_writer
+from leases import NODE_ID, init_leases, renew_leadership, is_leader, resign_leadership, get_leases
 
 # 配置日志
 logging.basicConfig(
@@ -88,7 +103,7 @@ class UserValidationResponse(BaseModel):
 # 数据库初始化
 async def init_database():
     """初始化数据库"""
-    async with aiosqlite.connect(settings.db_path) as db:
+    async with db_write() as db:
         # 创建粉丝数据表
         await db.execute('''
         CREATE TABLE IF NOT EXISTS social_media (
@@ -110,8 +125,23 @@ async def init_database():
             UNIQUE(platform, username)
         );''')
         
+        # 自适应抓取：每个用户的抓取间隔（分钟）和下次抓取时间
+        await ensure_column(db, "tracked_users", "poll_interval", "REAL")
+        await ensure_column(db, "tracked_users", "next_fetch_at", "TIMESTAMP")
+        # Twitter用户的rest_id，避免每次都按用户名解析
+        await ensure_column(db, "tracked_users", "rest_id", "TEXT")
+        
+        # 抓取任务队列和多副本租约
+        await init_job_queue(db)
+        await init_leases(db)
+        
         await db.commit()
         
+        # 按版本号执行数据库迁移（索引等）
+        await run_migrations(db)
+        # 已有数据但没有统计信息（例如新安装后首次积累了数据）时收集索引统计信息
+        await refresh_statistics(db)
+        
         # 插入默认用户（如果不存在）
         await db.execute('''
         INSERT OR IGNORE INTO tracked_users (platform, username, is_active) 
@@ -126,10 +156,27 @@ async def init_database():
         await db.commit()
         logger.info("Database initialized successfully")
 
+async def prepare_database():
+    """单独初始化数据库（启动脚本使用），完成后关闭连接池，否则连接线程会阻止进程退出"""
+    await start_database()
+    try:
+        await init_database()
+    finally:
+        await close_database()
+
+# 通过连接池的只读连接查询数据，供图表使用
+async def read_dataframe(sql: str, params) -> pd.DataFrame:
+    """执行查询并把结果转换为DataFrame"""
+    async with db_read() as db:
+        cursor = await db.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        rows = await cursor.fetchall()
+    return pd.DataFrame(rows, columns=columns)
+
 # 获取所有活跃用户
 async def get_active_users():
     """获取所有活跃的跟踪用户"""
-    async with aiosqlite.connect(settings.db_path) as db:
+    async with db_read() as db:
         cursor = await db.execute(
             "SELECT id, platform, username, created_at, is_active FROM tracked_users WHERE is_active = 1"
         )
@@ -191,6 +238,11 @@ async def validate_user(platform: str, username: str):
             "message": f"Validation error: {str(e)}"
         }
 
+# 保存粉丝数
+async def save_follower_count(platform: str, username: str, count: int):
+    """保存一条粉丝数数据，由写入缓冲批量写入数据库"""
+    await sample_writer.add(platform, username, count)
+
 # Instagram粉丝数抓取
 async def fetch_instagram_followers(username: str = None):
     """抓取Instagram粉丝数"""
@@ -203,19 +255,41 @@ async def fetch_instagram_followers(username: str = None):
             "User-Agent": "Instagram 76.0.0.15.395 Android (24/7.0; 640dpi; 1440x2560; samsung; SM-G930F; herolte; samsungexynos8890; en_US; 138226743)"
         }
         
-        response = requests.get(url, headers=headers, proxies=settings.proxy_config, timeout=10)
-        response.raise_for_status()
+        # 上游或代理持续出错时直接跳过，不再等待超时
+        proxy = select_proxy(url, "instagram")
+        if not circuit_breakers.allow("instagram", proxy):
+            logger.debug(f"Instagram circuit open, skipping {username}")
+            return None
+        
+        # Instagram按IP限流，每个出口代理有各自的令牌桶
+        await rate_limiter.acquire("instagram", proxy=proxy)
+        session = await get_http_client()
+        status = None
+        started = time.monotonic()
+        try:
+            async with session.get(
+                url,
+                headers=headers,
+                proxy=proxy,
+                timeout=aiohttp.ClientTimeout(total=10)
+            ) as response:
+                status = response.status
+                rate_limiter.observe("instagram", headers=response.headers, status=status, proxy=proxy)
+                circuit_breakers.record("instagram", proxy, status)
+                proxy_pool.record(proxy, time.monotonic() - started, status)
+                response.raise_for_status()
+                result = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            # 连接失败、代理错误或超时，没有拿到上游响应
+            if status is None:
+                circuit_breakers.record("instagram", proxy)
+                proxy_pool.record(proxy, time.monotonic() - started)
+            raise
         
-        result = response.json()
         count = result["data"]["user"]["edge_followed_by"]["count"]
         
         # 保存到数据库
-        async with aiosqlite.connect(settings.db_path) as db:
-            await db.execute(
-                "INSERT INTO social_media (platform, username, follower_count, time) VALUES (?, ?, ?, datetime('now'))",
-                ("instagram", username, count)
-            )
-            await db.commit()
+        await save_follower_count("instagram", username, count)
         
         logger.info(f"Instagram followers for {username}: {count}")
         return count
@@ -227,6 +301,155 @@ async def fetch_instagram_followers(username: str = None):
 # 导入Twitter API Python库
 from twitter_api_python import TwitterAPI
 
+# Twitter rest_id持久化存储
+REST_ID_UPDATE_SQL = "UPDATE tracked_users SET rest_id = ? WHERE platform = 'twitter' AND username = ? COLLATE NOCASE"
+
+# 尚未写入数据库的rest_id更新任务
+_rest_id_writes = set()
+
+class TrackedUserRestIdStore:
+    """把Twitter用户的rest_id保存在tracked_users表中
+
+    读取使用内存中的快照，由load()通过连接池一次性载入，缓存未命中时不在事件循环线程上查询数据库，
+    没有rest_id的用户也不会每次都查询；在事件循环中的写入交给后台任务，通过连接池的写连接排队执行。
+    """
+
+    def __init__(self):
+        # 小写用户名 -> rest_id，None表示尚未载入
+        self._rest_ids: Optional[dict] = None
+
+    async def load(self):
+        """从tracked_users中载入全部Twitter用户的rest_id"""
+        async with db_read() as db:
+            cursor = await db.execute(
+                "SELECT username, rest_id FROM tracked_users WHERE platform = 'twitter' AND rest_id IS NOT NULL"
+            )
+            rows = await cursor.fetchall()
+        self._rest_ids = {username.lower(): rest_id for username, rest_id in rows}
+
+    def get(self, screen_name: str) -> Optional[str]:
+        if self._rest_ids is None:
+            try:
+                asyncio.get_running_loop()
+                return None
+            except RuntimeError:
+                pass
+            # 在线程中调用同步接口且尚未载入快照时直接查询，不会阻塞事件循环
+            row = connect_sync().execute(
+                "SELECT rest_id FROM tracked_users WHERE platform = 'twitter' AND username = ? COLLATE NOCASE",
+                (screen_name,)
+            ).fetchone()
+            return row[0] if row else None
+        return self._rest_ids.get(screen_name.lower())
+
+    def set(self, screen_name: str, rest_id: Optional[str]):
+        if self._rest_ids is not None:
+            if rest_id:
+                self._rest_ids[screen_name.lower()] = rest_id
+            else:
+                self._rest_ids.pop(screen_name.lower(), None)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 在线程中调用同步接口时直接写入，等待写锁不会阻塞事件循环
+            conn = connect_sync()
+            with conn:
+                conn.execute(REST_ID_UPDATE_SQL, (rest_id, screen_name))
+            return
+        task = loop.create_task(save_rest_id(screen_name, rest_id))
+        _rest_id_writes.add(task)
+        task.add_done_callback(_rest_id_writes.discard)
+
+# 所有Twitter客户端共用的rest_id存储
+rest_id_store = TrackedUserRestIdStore()
+
+async def save_rest_id(screen_name: str, rest_id: Optional[str]):
+    """通过连接池的写连接保存rest_id"""
+    try:
+        async with db_write() as db:
+            await db.execute(REST_ID_UPDATE_SQL, (rest_id, screen_name))
+            await db.commit()
+    except Exception as e:
+        logger.warning(f"Failed to save rest_id for {screen_name}: {e}")
+
+async def flush_rest_ids():
+    """等待排队中的rest_id更新写入数据库，关闭连接池前调用"""
+    if _rest_id_writes:
+        await asyncio.gather(*list(_rest_id_writes), return_exceptions=True)
+
+# 共享的Twitter API客户端，按认证token缓存，复用cookies/CSRF/访客token
+_twitter_clients = {}
+
+def get_twitter_api(auth_token: Optional[str] = None) -> TwitterAPI:
+    """获取指定认证token对应的共享Twitter API客户端，不指定时使用配置中的全部token组成凭证池"""
+    auth_tokens = [auth_token] if auth_token else settings.twitter_auth_token_list
+    proxy_url = settings.proxy_config.get('http') if settings.proxy_config else None
+    
+    key = (tuple(auth_tokens), proxy_url)
+    if key not in _twitter_clients:
+        _twitter_clients[key] = TwitterAPI(
+            auth_tokens=auth_tokens,
+            quarantine_seconds=settings.twitter_credential_quarantine,
+            proxy=proxy_url,
+            session_factory=get_http_client,
+            rate_limiter=rate_limiter.for_platform("twitter"),
+            circuit_breaker=circuit_breakers.for_platform("twitter"),
+            proxy_pool=proxy_pool.for_platform("twitter") if proxy_pool else None,
+            rest_id_store=rest_id_store
+        )
+    return _twitter_clients[key]
+
+# Twitter粉丝数批量抓取
+async def fetch_twitter_followers_batch(usernames: list):
+    """批量抓取Twitter粉丝数，返回 {用户名: 粉丝数}
+
+    已知rest_id的用户通过一次UsersByRestIds请求获取，
+    其余用户（首次抓取或批量结果中缺失）逐个查询并记录rest_id；
+    批量请求失败时这些用户直接按失败返回，不逐个查询，也不清除rest_id。
+    """
+    results = {}
+    twitter_api = get_twitter_api()
+    # 每批查询一次数据库刷新rest_id快照（包括其他副本解析的rest_id），逐个用户查找时只读内存
+    await rest_id_store.load()
+    known = {}
+    for username in usernames:
+        rest_id = twitter_api.cached_rest_id(username)
+        if rest_id:
+            known[username] = rest_id
+    
+    if known:
+        try:
+            users = await twitter_api.get_users_by_rest_ids_async(known.values())
+        except Exception as e:
+            logger.error(f"Error fetching Twitter followers batch: {e}")
+            users = dict.fromkeys(known.values())
+        
+        unavailable = 0
+        for username, rest_id in known.items():
+            if rest_id in users and users[rest_id] is None:
+                # 批量请求失败（限流、超时等）：保留rest_id，本批用户按失败处理，由任务队列退避重试
+                results[username] = None
+                unavailable += 1
+                continue
+            user = users.get(rest_id)
+            if user and user.get('followers_count') is not None:
+                count = user['followers_count']
+                await save_follower_count("twitter", username, count)
+                results[username] = count
+        
+        if unavailable:
+            logger.warning(f"Twitter batch lookup failed for {unavailable}/{len(known)} users, leaving them for retry")
+        logger.info(f"Twitter batch lookup resolved {len(results) - unavailable}/{len(known)} users")
+    
+    for username in usernames:
+        if username not in results:
+            # 请求成功但响应中没有该用户：rest_id可能已失效，重新按用户名查询
+            if username in known:
+                twitter_api.forget_rest_id(username)
+            results[username] = await fetch_twitter_followers(username)
+    
+    return results
+
 # Twitter粉丝数抓取
 async def fetch_twitter_followers(username: str = None):
     """抓取Twitter粉丝数"""
@@ -234,25 +457,15 @@ async def fetch_twitter_followers(username: str = None):
         username = settings.default_twitter_user
         
     try:
-        # 初始化Twitter API客户端
-        proxy_url = settings.proxy_config.get('http') if settings.proxy_config else None
-        twitter_api = TwitterAPI(
-            auth_token=getattr(settings, 'twitter_auth_token', None),
-            proxy=proxy_url
-        )
+        twitter_api = get_twitter_api()
         
         # 获取用户信息
-        user = twitter_api.get_user(username)
+        user = await twitter_api.get_user_async(username)
         if user and user.get('followers_count') is not None:
             count = user['followers_count']
             
             # 保存到数据库
-            async with aiosqlite.connect(settings.db_path) as db:
-                await db.execute(
-                    "INSERT INTO social_media (platform, username, follower_count, time) VALUES (?, ?, ?, datetime('now'))",
-                    ("twitter", username, count)
-                )
-                await db.commit()
+            await save_follower_count("twitter", username, count)
             
             logger.info(f"Twitter followers for {username}: {count}")
             return count
@@ -264,54 +477,280 @@ async def fetch_twitter_followers(username: str = None):
         logger.error(f"Error fetching Twitter followers for {username}: {e}")
         return None
 
+# 是否按每个用户的下次抓取时间调度
+def uses_due_scheduling() -> bool:
+    """自适应抓取或分散调度模式下，每个用户有独立的下次抓取时间"""
+    return settings.adaptive_polling or settings.schedule_mode == "spread"
+
+# 分散调度：为还没有抓取时间的用户分配首次抓取时间
+async def spread_new_users(db, platform: str):
+    """把尚未安排抓取时间的用户均匀分散到一个抓取间隔内"""
+    cursor = await db.execute(
+        "SELECT id FROM tracked_users WHERE is_active = 1 AND platform = ? AND next_fetch_at IS NULL ORDER BY id",
+        (platform,)
+    )
+    user_ids = [row[0] for row in await cursor.fetchall()]
+    if not user_ids:
+        return
+    
+    offsets = spread_offsets(len(user_ids), settings.fetch_interval)
+    await db.executemany(
+        "UPDATE tracked_users SET next_fetch_at = datetime('now', ?) WHERE id = ?",
+        [(f"+{int(offset * 60)} seconds", user_id) for user_id, offset in zip(user_ids, offsets)]
+    )
+    await db.commit()
+    logger.info(f"Spread {len(user_ids)} new {platform} users across {settings.fetch_interval} minutes")
+
+# 获取到期需要抓取的用户
+async def get_due_users(platform: str):
+    """获取指定平台中已到下次抓取时间的活跃用户"""
+    async with db_write() as db:
+        if settings.schedule_mode == "spread":
+            await spread_new_users(db, platform)
+        
+        cursor = await db.execute(
+            """
+            SELECT username FROM tracked_users
+            WHERE is_active = 1 AND platform = ?
+              AND (next_fetch_at IS NULL OR next_fetch_at <= datetime('now'))
+            """,
+            (platform,)
+        )
+        return [row[0] for row in await cursor.fetchall()]
+
+# 根据历史数据更新用户的抓取间隔
+async def update_poll_schedule(platform: str, usernames: list, failed_users: list):
+    """安排每个用户的下次抓取时间
+
+    自适应抓取时根据最近粉丝数的变化情况计算间隔，否则使用固定间隔；
+    分散调度模式下再加上随机抖动，避免用户重新聚集到同一时刻。
+    """
+    async with db_write() as db:
+        for username in usernames:
+            if not settings.adaptive_polling:
+                interval = settings.fetch_interval
+            elif username in failed_users:
+                # 抓取失败时按最短间隔尽快重试
+                interval = settings.min_fetch_interval
+            else:
+                cursor = await db.execute(
+                    "SELECT follower_count, samples FROM social_media WHERE platform = ? AND username = ? "
+                    "ORDER BY time DESC, id DESC LIMIT ?",
+                    (platform, username, settings.polling_history_size)
+                )
+                # 合并存储的记录按采样次数展开，与逐条存储时得到相同的采样序列
+                counts = [count for count, samples in await cursor.fetchall() for _ in range(samples)]
+                counts = counts[:settings.polling_history_size]
+                interval = compute_poll_interval(
+                    counts, settings.min_fetch_interval, settings.max_fetch_interval
+                )
+            
+            delay = interval
+            if settings.schedule_mode == "spread":
+                delay = jittered_interval(interval, settings.schedule_jitter)
+            
+            await db.execute(
+                "UPDATE tracked_users SET poll_interval = ?, next_fetch_at = datetime('now', ?) WHERE platform = ? AND username = ?",
+                (interval, f"+{int(delay * 60)} seconds", platform, username)
+            )
+        await db.commit()
+
 # 定时任务 - 支持多个用户
-async def scheduled_instagram_fetch():
-    """定时抓取Instagram数据 - 支持多个用户"""
-    users = await get_active_users()
-    instagram_users = [user for user in users if user["platform"] == "instagram"]
+async def dispatch_fetch_jobs(platform: str):
+    """把需要抓取的用户加入任务队列，按用户调度时只加入到期的用户
+
+    多副本部署时只有持有主节点租约的进程负责入队，各副本共同执行队列中的任务。
+    """
+    if not is_leader():
+        return 0
     
-    for user in instagram_users:
-        try:
-            await fetch_instagram_followers(user["username"])
-        except Exception as e:
-            logger.error(f"Error fetching Instagram data for {user['username']}: {e}")
+    if uses_due_scheduling():
+        usernames = await get_due_users(platform)
+    else:
+        users = await get_active_users()
+        usernames = [user["username"] for user in users if user["platform"] == platform]
+    
+    added = await enqueue_jobs(platform, usernames)
+    if added:
+        logger.info(f"Enqueued {added} {platform} fetch jobs")
+    return added
+
+async def process_fetch_queue(platform: str, fetch_func, concurrency: int, batch_func=None, batch_size: int = 1):
+    """领取到期的抓取任务并执行，失败的任务按指数退避重新排队"""
+    stats = None
+    while True:
+        jobs = await claim_jobs(platform, settings.queue_claim_size)
+        if not jobs:
+            return stats
+        
+        # 执行期间续期任务租约，限流导致批次耗时超过租约时间时也不会被其他节点重复领取
+        async with holding_job_leases(jobs):
+            stats = await run_fetch_cycle(
+                platform, [job["username"] for job in jobs], fetch_func, concurrency,
+                batch_func=batch_func, batch_size=batch_size
+            )
+            
+            # 数据写入数据库后再标记任务完成，进程崩溃时任务会被重新领取而不是丢失数据；
+            # 数据写入失败被丢弃的任务按失败处理，稍后按退避重新抓取
+            lost_users = {row[1] for row in await sample_writer.flush(platform)}
+        
+        failed_users = set(stats["failed_users"])
+        skipped_users = set(stats["skipped_users"])
+        succeeded = [job for job in jobs if job["username"] not in failed_users | skipped_users]
+        failed = [job for job in jobs if job["username"] in failed_users]
+        # 熔断器断开时跳过的任务没有请求上游，等熔断器放行探测时重新执行，不计入尝试次数
+        skipped = [job for job in jobs if job["username"] in skipped_users]
+        await defer_jobs(skipped, stats["retry_in_seconds"], f"Skipped while {platform} circuit was open")
+        unsaved = [job for job in succeeded if job["username"] in lost_users]
+        succeeded = [job for job in succeeded if job["username"] not in lost_users]
+        await complete_jobs(succeeded)
+        dead = await fail_jobs(failed, f"Failed to fetch {platform} followers")
+        dead += await fail_jobs(unsaved, f"Failed to save {platform} followers")
+        
+        # 成功或最终失败的用户安排下次抓取，重试中的用户留在队列里
+        if uses_due_scheduling():
+            finished = [job["username"] for job in succeeded + dead]
+            await update_poll_schedule(platform, finished, [job["username"] for job in dead])
+
+async def refresh_database_statistics():
+    """定期检查数据量变化，必要时更新查询计划器使用的索引统计信息"""
+    async with db_write() as db:
+        return await refresh_statistics(db)
+
+async def scheduled_instagram_fetch():
+    """定时把Instagram用户加入抓取队列"""
+    return await dispatch_fetch_jobs("instagram")
 
 async def scheduled_twitter_fetch():
-    """定时抓取Twitter数据 - 支持多个用户"""
-    users = await get_active_users()
-    twitter_users = [user for user in users if user["platform"] == "twitter"]
-    
-    for user in twitter_users:
-        try:
-            await fetch_twitter_followers(user["username"])
-        except Exception as e:
-            logger.error(f"Error fetching Twitter data for {user['username']}: {e}")
+    """定时把Twitter用户加入抓取队列"""
+    return await dispatch_fetch_jobs("twitter")
 
-# 启动时初始化
-@app.on_event("startup")
-async def startup_event():
-    """应用启动时的初始化"""
-    await init_database()
-    
-    # 启动调度器
+async def process_instagram_queue():
+    """执行Instagram抓取任务"""
+    return await process_fetch_queue(
+        "instagram",
+        fetch_instagram_followers,
+        settings.instagram_fetch_concurrency
+    )
+
+async def process_twitter_queue():
+    """执行Twitter抓取任务"""
+    return await process_fetch_queue(
+        "twitter",
+        fetch_twitter_followers,
+        settings.twitter_fetch_concurrency,
+        batch_func=fetch_twitter_followers_batch,
+        batch_size=settings.twitter_batch_size
+    )
+
+async def start_scheduler():
+    """启动调度器并注册抓取相关的定时任务，API进程和独立的worker进程共用"""
     scheduler.start()
     
-    # 添加定时任务
+    # 多副本部署时通过数据库租约选出一个主节点负责入队
+    await renew_leadership()
+    scheduler.add_job(
+        renew_leadership,
+        IntervalTrigger(seconds=max(1, settings.leader_lease_ttl // 3)),
+        id="leader_lease",
+        replace_existing=True
+    )
+    
+    # 添加定时任务；按用户调度时以较短的周期检查到期用户
+    if uses_due_scheduling():
+        trigger_kwargs = {"seconds": settings.scheduler_tick}
+    else:
+        trigger_kwargs = {"minutes": settings.fetch_interval}
+    
     scheduler.add_job(
         scheduled_instagram_fetch,
-        IntervalTrigger(minutes=settings.fetch_interval),
+        IntervalTrigger(**trigger_kwargs),
         id="instagram_fetch",
         replace_existing=True
     )
     
     scheduler.add_job(
         scheduled_twitter_fetch,
-        IntervalTrigger(minutes=settings.fetch_interval),
+        IntervalTrigger(**trigger_kwargs),
         id="twitter_fetch",
         replace_existing=True
     )
     
-    logger.info(f"Scheduler started with {settings.fetch_interval}-minute intervals")
+    # 抓取任务队列：定期领取到期任务执行，并清理过期的历史任务
+    scheduler.add_job(
+        process_instagram_queue,
+        IntervalTrigger(seconds=settings.queue_poll_interval),
+        id="instagram_queue",
+        replace_existing=True
+    )
+    
+    scheduler.add_job(
+        process_twitter_queue,
+        IntervalTrigger(seconds=settings.queue_poll_interval),
+        id="twitter_queue",
+        replace_existing=True
+    )
+    
+    scheduler.add_job(
+        purge_finished_jobs,
+        IntervalTrigger(hours=1),
+        id="queue_purge",
+        replace_existing=True
+    )
+    
+    scheduler.add_job(
+        refresh_database_statistics,
+        IntervalTrigger(hours=1),
+        id="database_statistics",
+        replace_existing=True
+    )
+    
+    if settings.adaptive_polling:
+        logger.info(
+            f"Scheduler started with adaptive polling "
+            f"({settings.min_fetch_interval}-{settings.max_fetch_interval} minutes, tick {settings.scheduler_tick}s)"
+        )
+    elif settings.schedule_mode == "spread":
+        logger.info(
+            f"Scheduler started in spread mode "
+            f"({settings.fetch_interval}-minute intervals, tick {settings.scheduler_tick}s)"
+        )
+    else:
+        logger.info(f"Scheduler started with {settings.fetch_interval}-minute intervals")
+
+async def stop_scheduler():
+    """停止调度器并释放主节点租约"""
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    
+    await resign_leadership()
+
+# 启动时初始化
+@app.on_event("startup")
+async def startup_event():
+    """应用启动时的初始化"""
+    # 创建共享的数据库连接池
+    await start_database()
+    await init_database()
+    
+    # 创建共享HTTP客户端和粉丝数写入缓冲
+    await start_http_client()
+    await sample_writer.start()
+    
+    # 抓取由独立的worker进程负责时，API进程不启动调度器
+    if settings.enable_scheduler:
+        await start_scheduler()
+    else:
+        logger.info("Scheduler disabled in this process, fetching is left to the worker")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时的清理"""
+    await stop_scheduler()
+    await sample_writer.stop()
+    await flush_rest_ids()
+    await close_http_client()
+    await close_database()
 
 # API端点
 
@@ -334,7 +773,7 @@ async def health_check():
 async def get_users():
     """获取所有跟踪的用户"""
     try:
-        async with aiosqlite.connect(settings.db_path) as db:
+        async with db_read() as db:
             cursor = await db.execute(
                 "SELECT id, platform, username, created_at, is_active FROM tracked_users ORDER BY platform, username"
             )
@@ -373,11 +812,14 @@ async def add_user(user: UserRequest):
                 validation_result=validation_result
             )
         
+        # 验证时解析到的rest_id在用户记录插入之前无法保存，插入时一并写入
+        rest_id = get_twitter_api().cached_rest_id(user.username) if user.platform.lower() == "twitter" else None
+        
         # 验证成功，添加到数据库
-        async with aiosqlite.connect(settings.db_path) as db:
+        async with db_write() as db:
             cursor = await db.execute(
-                "INSERT INTO tracked_users (platform, username, is_active) VALUES (?, ?, 1)",
-                (user.platform, user.username)
+                "INSERT INTO tracked_users (platform, username, is_active, rest_id) VALUES (?, ?, 1, ?)",
+                (user.platform, user.username, rest_id)
             )
             await db.commit()
             
@@ -407,7 +849,7 @@ async def add_user(user: UserRequest):
 async def delete_user(user_id: int):
     """删除用户（软删除，设置为非活跃）"""
     try:
-        async with aiosqlite.connect(settings.db_path) as db:
+        async with db_write() as db:
             cursor = await db.execute(
                 "UPDATE tracked_users SET is_active = 0 WHERE id = ?",
                 (user_id,)
@@ -429,7 +871,7 @@ async def delete_user(user_id: int):
 async def activate_user(user_id: int):
     """激活用户"""
     try:
-        async with aiosqlite.connect(settings.db_path) as db:
+        async with db_write() as db:
             cursor = await db.execute(
                 "UPDATE tracked_users SET is_active = 1 WHERE id = ?",
                 (user_id,)
@@ -469,8 +911,8 @@ async def get_followers(
 ):
     """获取粉丝数据"""
     try:
-        async with aiosqlite.connect(settings.db_path) as db:
-            query = "SELECT platform, username, follower_count, time FROM social_media"
+        async with db_read() as db:
+            query = "SELECT platform, username, follower_count, time FROM follower_samples"
             params = []
             
             if platform or username:
@@ -508,9 +950,9 @@ async def get_followers(
 async def get_latest_followers():
     """获取最新的粉丝数据"""
     try:
-        async with aiosqlite.connect(settings.db_path) as db:
+        async with db_read() as db:
             cursor = await db.execute("""
-                SELECT platform, username, follower_count, time 
+                SELECT platform, username, follower_count, COALESCE(last_seen, time)
                 FROM social_media 
                 WHERE id IN (
                     SELECT MAX(id) 
@@ -543,14 +985,10 @@ async def generate_chart(platform: str, username: str):
         if not os.path.exists(settings.db_path):
             raise HTTPException(status_code=404, detail=f"Database not found: {settings.db_path}")
         
-        # 连接数据库
-        conn = sqlite3.connect(settings.db_path)
-        df = pd.read_sql_query(
-            'SELECT platform, username, follower_count, time FROM social_media WHERE platform = ? AND username = ?',
-            conn,
-            params=(platform, username)
+        df = await read_dataframe(
+            'SELECT platform, username, follower_count, time FROM follower_samples WHERE platform = ? AND username = ?',
+            (platform, username)
         )
-        conn.close()
 
         if df.empty:
             raise HTTPException(status_code=404, detail=f"No data found for {platform}/{username}")
@@ -820,22 +1258,74 @@ async def manual_fetch_twitter(username: str = None):
     else:
         raise HTTPException(status_code=500, detail="Failed to fetch Twitter data")
 
+@app.get("/api/fetch/stats")
+async def get_fetch_stats():
+    """获取最近一次定时抓取周期的统计信息"""
+    return last_cycle_stats
+
+@app.get("/api/queue")
+async def get_queue():
+    """获取抓取任务队列的深度、延迟和最近的死信任务"""
+    try:
+        stats = await get_queue_stats()
+        stats["node_id"] = NODE_ID
+        stats["is_leader"] = is_leader()
+        stats["leases"] = await get_leases()
+        stats["sample_writer"] = sample_writer.stats()
+        return stats
+    except Exception as e:
+        logger.error(f"Error getting queue stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/ratelimit")
+async def get_rate_limits():
+    """获取各平台/凭证限流器的当前令牌数和排队数"""
+    return rate_limiter.snapshot()
+
+@app.get("/api/twitter/credentials")
+async def get_twitter_credentials():
+    """获取Twitter凭证池中各token的剩余额度和隔离状态，以及访客token池的状态"""
+    twitter_api = get_twitter_api()
+    return {
+        "credentials": twitter_api.credential_stats(),
+        "guest_tokens": twitter_api.guest_token_stats(),
+    }
+
+@app.get("/api/proxies")
+async def get_proxies():
+    """获取代理池中各代理的延迟、错误率和是否被移出"""
+    return proxy_pool.snapshot()
+
+@app.get("/api/circuit")
+async def get_circuit_breakers():
+    """获取各平台/代理熔断器的状态和失败比例"""
+    return circuit_breakers.snapshot()
+
 @app.get("/api/stats")
 async def get_stats():
     """获取统计信息"""
     try:
-        async with aiosqlite.connect(settings.db_path) as db:
-            # 总记录数
-            cursor = await db.execute("SELECT COUNT(*) FROM social_media")
-            total_records = (await cursor.fetchone())[0]
+        async with db_read() as db:
+            # 每个用户实际存储的行数（只读索引）
+            cursor = await db.execute("SELECT platform, username, COUNT(*) FROM social_media GROUP BY platform, username")
+            user_rows = await cursor.fetchall()
             
-            # 平台统计
-            cursor = await db.execute("SELECT platform, COUNT(*) FROM social_media GROUP BY platform")
-            platform_stats = await cursor.fetchall()
+            # 合并存储的记录额外代表的采样次数，只有带last_seen的记录需要读取
+            cursor = await db.execute(
+                "SELECT platform, username, SUM(samples - 1) FROM social_media "
+                "WHERE last_seen IS NOT NULL GROUP BY platform, username"
+            )
+            merged = {(row[0], row[1]): row[2] for row in await cursor.fetchall()}
             
-            # 用户统计
-            cursor = await db.execute("SELECT platform, username, COUNT(*) FROM social_media GROUP BY platform, username")
-            user_stats = await cursor.fetchall()
+            # 用户统计（按采样次数计算）
+            user_stats = [(p, u, rows + merged.get((p, u), 0)) for p, u, rows in user_rows]
+            
+            # 总记录数和平台统计
+            stored_rows = sum(row[2] for row in user_rows)
+            total_records = sum(row[2] for row in user_stats)
+            platform_stats = {}
+            for platform, _, records in user_stats:
+                platform_stats[platform] = platform_stats.get(platform, 0) + records
             
             # 活跃用户统计
             cursor = await db.execute("SELECT platform, COUNT(*) FROM tracked_users WHERE is_active = 1 GROUP BY platform")
@@ -843,7 +1333,8 @@ async def get_stats():
             
             return {
                 "total_records": total_records,
-                "platform_stats": {row[0]: row[1] for row in platform_stats},
+                "stored_rows": stored_rows,
+                "platform_stats": platform_stats,
                 "user_stats": [{"platform": row[0], "username": row[1], "records": row[2]} for row in user_stats],
                 "active_users": {row[0]: row[1] for row in active_users}
             }
@@ -852,31 +1343,77 @@ async def get_stats():
         logger.error(f"Error getting stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# 在现有的imports后添加新的helper函数
+# 按用户和时间范围查询：条件直接作用在time列上，走idx_social_media_user_time索引的范围扫描，
+# 不要写成 date(time) >= date(?)，对列套函数后索引无法使用。
+# follower_samples视图把合并存储的记录展开为首尾两个采样点，两种存储模式下查询方式相同；
+# 开始于范围之前、延续到范围之内的记录在起始时间补一个采样点，否则平稳的账号只剩最后一个点
+SPANNING_RUN_WHERE = (
+    "platform = :platform AND username = :username AND time < :start AND last_seen > :start"
+)
+USER_RANGE_SQL = (
+    "SELECT platform, username, follower_count, :start AS time FROM social_media "
+    f"WHERE {SPANNING_RUN_WHERE} "
+    "UNION ALL "
+    "SELECT platform, username, follower_count, time FROM follower_samples "
+    "WHERE platform = :platform AND username = :username AND time >= :start ORDER BY time ASC"
+)
+# 跨越起始时间的记录：按时间比例估算其中落在范围内的采样次数
+GROWTH_SPANNING_SQL = (
+    "SELECT follower_count, 1 + CAST(ROUND((samples - 1) * (julianday(last_seen) - julianday(:start)) "
+    "/ (julianday(last_seen) - julianday(time))) AS INTEGER) "
+    f"FROM social_media WHERE {SPANNING_RUN_WHERE} ORDER BY last_seen DESC LIMIT 1"
+)
+GROWTH_FIRST_SQL = (
+    "SELECT follower_count, time FROM follower_samples "
+    "WHERE platform = :platform AND username = :username AND time >= :start ORDER BY time ASC LIMIT 1"
+)
+GROWTH_LAST_SQL = (
+    "SELECT follower_count, time FROM follower_samples "
+    "WHERE platform = :platform AND username = :username AND time >= :start ORDER BY time DESC LIMIT 1"
+)
+# 按采样次数计数，合并存储的记录与逐条存储时的记录数一致
+GROWTH_COUNT_SQL = (
+    "SELECT COALESCE(SUM(samples), 0) FROM social_media "
+    "WHERE platform = :platform AND username = :username AND time >= :start"
+)
+
+def range_start(start_date: str) -> str:
+    """把起始日期转换为与time列格式一致的当天零点，等价于 date(time) >= date(start_date)"""
+    return pd.to_datetime(start_date).strftime('%Y-%m-%d 00:00:00')
+
+def range_params(platform: str, username: str, start_date: str) -> dict:
+    """按用户和时间范围查询的参数"""
+    return {"platform": platform, "username": username, "start": range_start(start_date)}
+
 async def get_growth_data_from_date(platform: str, username: str, start_date: str):
     """获取指定日期开始的数据，计算增长量"""
     try:
-        async with aiosqlite.connect(settings.db_path) as db:
-            # 获取指定日期开始的所有数据
-            cursor = await db.execute("""
-                SELECT follower_count, time 
-                FROM social_media 
-                WHERE platform = ? AND username = ? AND date(time) >= date(?)
-                ORDER BY time ASC
-            """, (platform, username, start_date))
-            rows = await cursor.fetchall()
-            
-            if len(rows) < 2:
+        params = range_params(platform, username, start_date)
+        async with db_read() as db:
+            # 只需要范围内的首尾两条记录和记录数，不读取整段历史
+            cursor = await db.execute(GROWTH_SPANNING_SQL, params)
+            spanning = await cursor.fetchone()
+            cursor = await db.execute(GROWTH_COUNT_SQL, params)
+            data_points = (await cursor.fetchone())[0] + (spanning[1] if spanning else 0)
+            if data_points < 2:
                 return None
             
+            if spanning:
+                first = (spanning[0], params["start"])
+            else:
+                cursor = await db.execute(GROWTH_FIRST_SQL, params)
+                first = await cursor.fetchone()
+            cursor = await db.execute(GROWTH_LAST_SQL, params)
+            last = await cursor.fetchone()
+            
             # 计算增长数据
-            initial_count = rows[0][0]
-            final_count = rows[-1][0]
+            initial_count = first[0]
+            final_count = last[0]
             total_growth = final_count - initial_count
             growth_percentage = (total_growth / initial_count * 100) if initial_count > 0 else 0
             
             # 计算每日平均增长
-            time_span = (pd.to_datetime(rows[-1][1]) - pd.to_datetime(rows[0][1])).days
+            time_span = (pd.to_datetime(last[1]) - pd.to_datetime(first[1])).days
             daily_growth = total_growth / time_span if time_span > 0 else 0
             
             return {
@@ -888,7 +1425,7 @@ async def get_growth_data_from_date(platform: str, username: str, start_date: st
                 "growth_percentage": growth_percentage,
                 "daily_growth": daily_growth,
                 "time_span_days": time_span,
-                "data_points": len(rows)
+                "data_points": data_points
             }
             
     except Exception as e:
@@ -974,23 +1511,14 @@ async def generate_comparison_chart(
         except ValueError:
             raise HTTPException(status_code=400, detail="日期格式错误，应为 YYYY-MM-DD 格式")
         
-        # 连接数据库获取数据
-        conn = sqlite3.connect(settings.db_path)
-        
         # 为每个用户获取数据
         all_data = []
         for platform, username in user_list:
-            df = pd.read_sql_query(
-                'SELECT platform, username, follower_count, time FROM social_media WHERE platform = ? AND username = ? AND date(time) >= date(?) ORDER BY time ASC',
-                conn,
-                params=(platform, username, start_date)
-            )
+            df = await read_dataframe(USER_RANGE_SQL, range_params(platform, username, start_date))
             if not df.empty:
                 df['time'] = pd.to_datetime(df['time'])
                 all_data.append(df)
         
-        conn.close()
-        
         if len(all_data) < 2:
             raise HTTPException(status_code=404, detail="没有足够的数据进行比较")
         
@@ -0,0 +1,47 @@
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def compute_poll_interval(counts: list, min_interval: float, max_interval: float) -> float:
+    """根据最近的粉丝数变化情况计算抓取间隔（分钟）
+
+    相邻两次采样中粉丝数发生变化的比例越高，间隔越接近min_interval；
+    长时间没有变化的用户间隔逐渐放大到max_interval。
+    历史数据不足时使用min_interval，尽快积累样本。
+
+    Args:
+        counts: 最近的粉丝数采样，按时间先后或倒序均可
+        min_interval: 最短抓取间隔（分钟）
+        max_interval: 最长抓取间隔（分钟）
+    """
+    if max_interval < min_interval:
+        max_interval = min_interval
+
+    if len(counts) < 2:
+        return min_interval
+
+    changes = sum(1 for prev, curr in zip(counts, counts[1:]) if prev != curr)
+    change_ratio = changes / (len(counts) - 1)
+
+    return max_interval - (max_interval - min_interval) * change_ratio
+
+
+def spread_offsets(count: int, interval: float) -> list:
+    """把count个用户的首次抓取时间均匀分散到一个间隔内（分钟）
+
+    间隔被等分为count个时间槽，每个用户落在自己时间槽内的随机位置，
+    既保证整体均匀，又避免用户之间严格同步。
+    """
+    if count <= 0:
+        return []
+    slot = interval / count
+    return [(i + random.random()) * slot for i in range(count)]
+
+
+def jittered_interval(interval: float, jitter: float) -> float:
+    """给抓取间隔加上±jitter比例的随机抖动（分钟）"""
+    if jitter <= 0:
+        return interval
+    return interval * (1 + random.uniform(-jitter, jitter))
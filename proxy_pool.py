@@ -0,0 +1,153 @@
+import time
+import random
+import logging
+import threading
+from typing import Optional
+
+from config import settings
+from circuit_breaker import circuit_breakers, is_failure_status, mask_proxy
+from http_client import get_proxy
+
+logger = logging.getLogger(__name__)
+
+# 延迟和错误率的指数滑动平均系数
+EWMA_ALPHA = 0.2
+# 只有失败记录、还没有测到延迟的代理按此延迟（秒）计算分数
+UNKNOWN_LATENCY = 1.0
+
+
+class ProxyStats:
+    """单个代理的健康状况"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.latency = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self.requests = 0
+        self.failures = 0
+        self.evicted_until = 0.0
+
+    def score(self) -> float:
+        """分数越低越优先；从未使用过的代理优先尝试"""
+        if self.latency is None and self.requests == 0:
+            return 0.0
+        latency = UNKNOWN_LATENCY if self.latency is None else self.latency
+        return latency / max(0.05, 1 - self.error_rate)
+
+
+class ProxyPool:
+    """代理池：按延迟和错误率选择代理，错误率过高的代理暂时移出"""
+
+    def __init__(self, proxies: list, eviction_seconds: float, error_threshold: float, min_samples: int):
+        """
+        Args:
+            proxies: 代理地址列表
+            eviction_seconds: 代理被移出后多久重新加入（秒）
+            error_threshold: 错误率（滑动平均）达到该值时移出代理
+            min_samples: 至少有这么多次请求结果才判断是否移出
+        """
+        self.proxies = {url: ProxyStats(url) for url in proxies}
+        self.eviction_seconds = eviction_seconds
+        self.error_threshold = error_threshold
+        self.min_samples = max(1, min_samples)
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.proxies)
+
+    def choose(self, platform: Optional[str] = None) -> Optional[str]:
+        """选择一个代理：健康代理按分数的倒数加权随机选择
+
+        加权随机让请求分散到多个出口IP，同时较快、较稳定的代理承担更多请求。
+        指定平台时跳过该平台熔断器处于断开状态的代理，请求换到其他健康代理上。
+        所有代理都被移出或熔断时，选择最早恢复的一个。
+        """
+        if not self.proxies:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            healthy = [stats for stats in self.proxies.values() if stats.evicted_until <= now]
+            if platform is not None:
+                closed = [stats for stats in healthy if not circuit_breakers.is_open(platform, stats.url)]
+                if healthy and not closed:
+                    return min(healthy, key=lambda stats: circuit_breakers.breaker(platform, stats.url).retry_in()).url
+                healthy = closed
+            if not healthy:
+                return min(self.proxies.values(), key=lambda stats: stats.evicted_until).url
+            weights = [1 / max(stats.score(), 0.01) for stats in healthy]
+            return random.choices(healthy, weights=weights)[0].url
+
+    def record(self, proxy: Optional[str], latency: float, status: Optional[int] = None):
+        """记录一次请求结果，status为None表示请求异常或超时；不在池中的代理忽略"""
+        stats = self.proxies.get(proxy)
+        if stats is None:
+            return
+        failed = status is None or is_failure_status(status)
+        with self._lock:
+            stats.requests += 1
+            stats.samples += 1
+            if failed:
+                stats.failures += 1
+            else:
+                stats.latency = latency if stats.latency is None else \
+                    EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * stats.latency
+            stats.error_rate = EWMA_ALPHA * float(failed) + (1 - EWMA_ALPHA) * stats.error_rate
+
+            if stats.samples >= self.min_samples and stats.error_rate >= self.error_threshold:
+                stats.evicted_until = time.monotonic() + self.eviction_seconds
+                # 重新加入后从头积累样本
+                stats.samples = 0
+                stats.error_rate = 0.0
+                logger.warning(f"Evicting proxy {mask_proxy(proxy)} for {self.eviction_seconds}s")
+
+    def for_platform(self, platform: str) -> "PlatformProxyPool":
+        return PlatformProxyPool(self, platform)
+
+    def snapshot(self) -> list:
+        now = time.monotonic()
+        return [
+            {
+                "proxy": mask_proxy(stats.url),
+                "healthy": stats.evicted_until <= now,
+                "latency_ms": round(stats.latency * 1000, 1) if stats.latency is not None else None,
+                "error_rate": round(stats.error_rate, 3),
+                "requests": stats.requests,
+                "failures": stats.failures,
+                "evicted_for_seconds": round(max(0.0, stats.evicted_until - now), 1),
+            }
+            for stats in self.proxies.values()
+        ]
+
+
+class PlatformProxyPool:
+    """绑定到单个平台的代理池，选择代理时跳过该平台熔断的代理，供twitter_api_python使用"""
+
+    def __init__(self, pool: ProxyPool, platform: str):
+        self.pool = pool
+        self.platform = platform
+
+    def __bool__(self):
+        return bool(self.pool)
+
+    def choose(self) -> Optional[str]:
+        return self.pool.choose(self.platform)
+
+    def record(self, proxy: Optional[str], latency: float, status: Optional[int] = None):
+        self.pool.record(proxy, latency, status)
+
+
+def select_proxy(url: str, platform: Optional[str] = None) -> Optional[str]:
+    """为请求选择代理：配置了代理池时从池中选择（跳过该平台熔断的代理），否则使用http_proxy/https_proxy"""
+    if proxy_pool:
+        return proxy_pool.choose(platform)
+    return get_proxy(url)
+
+
+# 全局代理池实例
+proxy_pool = ProxyPool(
+    settings.proxy_pool_urls,
+    eviction_seconds=settings.proxy_eviction_seconds,
+    error_threshold=settings.proxy_error_threshold,
+    min_samples=settings.proxy_min_samples,
+)
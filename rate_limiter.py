@@ -0,0 +1,160 @@
+import time
+import asyncio
+import logging
+from typing import Optional
+
+from config import settings
+from circuit_breaker import mask_proxy
+
+logger = logging.getLogger(__name__)
+
+# 收到429但没有限流响应头时的默认暂停时间（秒）
+DEFAULT_BACKOFF = 60
+
+
+class TokenBucket:
+    """令牌桶：按固定速率补充令牌，取不到令牌的请求排队等待"""
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        # 上游明确要求暂停时，在此时间点之前不发放令牌
+        self.blocked_until = 0.0
+        self.waiting = 0
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """获取一个令牌，必要时等待"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        self.waiting += 1
+        try:
+            # 排队按先来先得的顺序发放令牌
+            async with self._lock:
+                while True:
+                    self._refill()
+                    now = time.monotonic()
+                    if now < self.blocked_until:
+                        await asyncio.sleep(self.blocked_until - now)
+                        continue
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+    def observe(self, headers=None, status: Optional[int] = None):
+        """根据上游返回的限流响应头调整令牌数量"""
+        headers = headers or {}
+        self._refill()
+
+        remaining = headers.get("x-rate-limit-remaining")
+        reset_at = headers.get("x-rate-limit-reset")
+        retry_after = headers.get("Retry-After")
+
+        try:
+            if remaining is not None:
+                self.tokens = min(self.tokens, float(remaining))
+                if float(remaining) <= 0 and reset_at:
+                    self._block_for(float(reset_at) - time.time())
+            if retry_after:
+                self._block_for(float(retry_after))
+            elif status == 429 and not reset_at:
+                self._block_for(DEFAULT_BACKOFF)
+        except ValueError:
+            logger.warning(f"Ignoring malformed rate limit headers: {dict(headers)}")
+
+    def _block_for(self, seconds: float):
+        if seconds > 0:
+            self.tokens = 0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def snapshot(self) -> dict:
+        self._refill()
+        return {
+            "tokens": round(self.tokens, 2),
+            "capacity": self.capacity,
+            "rate_per_minute": round(self.rate * 60, 2),
+            "queue_depth": self.waiting,
+            "blocked_for_seconds": round(max(0.0, self.blocked_until - time.monotonic()), 1),
+        }
+
+
+class RateLimiter:
+    """按平台、凭证和出口代理划分的令牌桶集合，调度任务和手动接口共享
+
+    按IP限流的上游（如Instagram）按代理分别计数，代理池中每个出口各有一份预算。
+    """
+
+    def __init__(self, budgets: dict):
+        """
+        Args:
+            budgets: {平台: (每分钟请求数, 突发容量)}，每个令牌桶各自使用这份预算
+        """
+        self.budgets = budgets
+        self.buckets = {}
+
+    def bucket(self, platform: str, credential: Optional[str] = None, proxy: Optional[str] = None) -> TokenBucket:
+        key = (platform, credential, proxy)
+        if key not in self.buckets:
+            rate, burst = self.budgets[platform]
+            self.buckets[key] = TokenBucket(rate, burst)
+        return self.buckets[key]
+
+    async def acquire(self, platform: str, credential: Optional[str] = None, proxy: Optional[str] = None):
+        await self.bucket(platform, credential, proxy).acquire()
+
+    def observe(self, platform: str, credential: Optional[str] = None, headers=None, status: Optional[int] = None,
+                proxy: Optional[str] = None):
+        self.bucket(platform, credential, proxy).observe(headers, status)
+
+    def for_platform(self, platform: str) -> "PlatformRateLimiter":
+        return PlatformRateLimiter(self, platform)
+
+    def snapshot(self) -> list:
+        return [
+            {
+                "platform": platform,
+                "credential": mask_credential(credential),
+                "proxy": mask_proxy(proxy) if proxy else None,
+                **bucket.snapshot(),
+            }
+            for (platform, credential, proxy), bucket in self.buckets.items()
+        ]
+
+
+class PlatformRateLimiter:
+    """绑定到单个平台的限流器，供twitter_api_python等只按凭证区分的调用方使用"""
+
+    def __init__(self, limiter: RateLimiter, platform: str):
+        self.limiter = limiter
+        self.platform = platform
+
+    async def acquire(self, credential: Optional[str] = None):
+        await self.limiter.acquire(self.platform, credential)
+
+    def observe(self, credential: Optional[str] = None, headers=None, status: Optional[int] = None):
+        self.limiter.observe(self.platform, credential, headers, status)
+
+
+def mask_credential(credential: Optional[str]) -> Optional[str]:
+    """隐藏凭证内容，只保留末尾几位用于区分"""
+    if not credential or len(credential) <= 8:
+        return credential
+    return f"***{credential[-4:]}"
+
+
+# 全局限流器实例
+rate_limiter = RateLimiter({
+    "instagram": (settings.instagram_rate_limit, settings.instagram_rate_burst),
+    "twitter": (settings.twitter_rate_limit, settings.twitter_rate_burst),
+})
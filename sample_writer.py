@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from config import settings
+from database import db_write
+
+logger = logging.getLogger(__name__)
+
+INSERT_SAMPLES_SQL = "INSERT INTO social_media (platform, username, follower_count, time) VALUES (?, ?, ?, ?)"
+LATEST_RUN_SQL = (
+    "SELECT id, follower_count, COALESCE(last_seen, time) FROM social_media "
+    "WHERE platform = ? AND username = ? ORDER BY time DESC, id DESC LIMIT 1"
+)
+EXTEND_RUN_SQL = "UPDATE social_media SET last_seen = ?, samples = samples + 1 WHERE id = ?"
+
+# 写入失败时的重试次数和间隔（秒）
+WRITE_ATTEMPTS = 3
+WRITE_RETRY_DELAY = 1.0
+
+
+def utc_timestamp() -> str:
+    """与SQLite datetime('now')格式一致的UTC时间"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+async def write_runs(db, rows: list):
+    """按游程写入：粉丝数与该用户最新一条记录相同时延长该记录，否则插入新记录"""
+    for platform, username, count, seen_at in rows:
+        cursor = await db.execute(LATEST_RUN_SQL, (platform, username))
+        latest = await cursor.fetchone()
+        if latest is not None and latest[1] == count and latest[2] <= seen_at:
+            await db.execute(EXTEND_RUN_SQL, (seen_at, latest[0]))
+        else:
+            await db.execute(INSERT_SAMPLES_SQL, (platform, username, count, seen_at))
+
+
+async def write_samples(rows: list):
+    """在一个事务中写入一批粉丝数数据"""
+    async with db_write() as db:
+        if settings.sample_storage == "rle":
+            await write_runs(db, rows)
+        else:
+            await db.executemany(INSERT_SAMPLES_SQL, rows)
+        await db.commit()
+
+
+class SampleWriter:
+    """粉丝数写入缓冲：后台任务汇总各抓取协程提交的数据，攒够一批或到达间隔时在一个事务中写入
+
+    每条数据单独提交时每次都要等待一次磁盘同步；合并写入后同步次数只与批次数有关。
+    缓冲区有上限，写满时提交数据的协程会等待，避免数据库跟不上时内存无限增长。
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int):
+        """
+        Args:
+            batch_size: 每批最多写入的数据条数
+            flush_interval: 第一条数据进入缓冲后最多等待多久写入（秒）
+            max_pending: 缓冲区最多容纳的数据条数
+        """
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_pending = max(1, max_pending)
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        # 写入失败被丢弃、还没有通过flush报告给调用方的数据
+        self._lost = []
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Sample writer started (batch size {self.batch_size}, flush interval {self.flush_interval}s)")
+
+    async def add(self, platform: str, username: str, count: int):
+        """提交一条粉丝数数据，缓冲区已满时等待；写入器未启动时直接写入"""
+        row = (platform, username, count, utc_timestamp())
+        if not self.running:
+            await write_samples([row])
+            return
+        await self._queue.put(row)
+
+    async def flush(self, platform: Optional[str] = None) -> list:
+        """等待此前提交的数据处理完毕，返回写入失败被丢弃的数据
+
+        Args:
+            platform: 只返回该平台的丢弃数据，其他平台的留给对应平台的flush报告
+        """
+        if self.running:
+            done = asyncio.get_running_loop().create_future()
+            await self._queue.put(done)
+            await done
+        lost = [row for row in self._lost if platform is None or row[0] == platform]
+        self._lost = [row for row in self._lost if platform is not None and row[0] != platform]
+        return lost
+
+    async def stop(self):
+        """写入缓冲区中剩余的数据并停止后台任务"""
+        if not self.running:
+            return
+        await self.flush()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info(f"Sample writer stopped ({self.written} samples in {self.batches} batches)")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = []
+            waiters = []
+            item = await self._queue.get()
+            deadline = loop.time() + self.flush_interval
+            while True:
+                if isinstance(item, asyncio.Future):
+                    # flush请求：立即写入已经收到的数据
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+
+            if batch:
+                await self._write(batch)
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    async def _write(self, batch: list):
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                await write_samples(batch)
+                self.written += len(batch)
+                self.batches += 1
+                return
+            except Exception as e:
+                if attempt == WRITE_ATTEMPTS:
+                    self.dropped += len(batch)
+                    self._lost.extend(batch)
+                    logger.error(f"Dropping {len(batch)} follower samples after {attempt} failed writes: {e}")
+                    return
+                logger.warning(f"Failed to write {len(batch)} follower samples (attempt {attempt}): {e}")
+                await asyncio.sleep(WRITE_RETRY_DELAY * attempt)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+        }
+
+
+# 全局写入缓冲实例
+sample_writer = SampleWriter(
+    batch_size=settings.sample_batch_size,
+    flush_interval=settings.sample_flush_interval,
+    max_pending=settings.sample_queue_size,
+)
@@ -4,11 +4,25 @@
 export PYTHONPATH=/app
 export PYTHONUNBUFFERED=1
 
+# 运行模式：all - API和抓取在同一进程（默认）；api - 只提供接口；worker - 只运行调度和抓取
+MODE="${1:-${APP_MODE:-all}}"
+
 # 确保数据目录存在
 mkdir -p /app/data
 
 # 初始化数据库
-python -c "import asyncio; from main import init_database; asyncio.run(init_database())"
+python -c "import asyncio; from main import prepare_database; asyncio.run(prepare_database())"
 
 # 启动应用
-exec uvicorn main:app --host 0.0.0.0 --port 8000 
\ No newline at end of file
+case "$MODE" in
+    worker)
+        exec python worker.py
+        ;;
+    api)
+        export ENABLE_SCHEDULER=false
+        exec uvicorn main:app --host 0.0.0.0 --port 8000
+        ;;
+    *)
+        exec uvicorn main:app --host 0.0.0.0 --port 8000
+        ;;
+esac
@@ -6,7 +6,11 @@ Twitter API Python 客户端
 from .api import TwitterAPI
 from .utils import TwitterUtils
 from .login import TwitterLogin
+from .cache import MemoryResponseCache, SQLiteResponseCache
+from .tweet import Tweet, TwitterUser
+from .sync import MemorySyncStateStore, SQLiteSyncStateStore
 
 __version__ = "1.0.0"
 __author__ = "Twitter API Python Client"
-__all__ = ["TwitterAPI", "TwitterUtils", "TwitterLogin"] 
\ No newline at end of file
+__all__ = ["TwitterAPI", "TwitterUtils", "TwitterLogin", "MemoryResponseCache", "SQLiteResponseCache",
+           "Tweet", "TwitterUser", "MemorySyncStateStore", "SQLiteSyncStateStore"] 
\ No newline at end of file
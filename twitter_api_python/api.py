@@ -1,26 +1,143 @@
 import json
 import logging
-from .constants import BASE_URL, GQL_MAP, GQL_FEATURES
+from .constants import BASE_URL, GQL_MAP, GQL_FEATURES, USERS_BY_REST_IDS_MAX
 from .utils import TwitterUtils
+from .cache import LRUCache
+from .credentials import QUARANTINE_SECONDS
+from .sync import TimelineSync, MemorySyncStateStore
 
 logger = logging.getLogger(__name__)
 
+# 各时间线接口的默认请求变量
+TIMELINE_VARIABLES = {
+    'UserTweets': {
+        'count': 20,
+        'includePromotedContent': True,
+        'withQuickPromoteEligibilityTweetFields': True,
+        'withVoice': True,
+        'withV2Timeline': True
+    },
+    'UserTweetsAndReplies': {
+        'count': 20,
+        'includePromotedContent': True,
+        'withCommunity': True,
+        'withVoice': True,
+        'withV2Timeline': True
+    },
+    'Likes': {
+        'includeHasBirdwatchNotes': False,
+        'includePromotedContent': False,
+        'withBirdwatchNotes': False,
+        'withVoice': False,
+        'withV2Timeline': True
+    },
+    'SearchTimeline': {
+        'count': 20,
+        'querySource': 'typed_query',
+        'product': 'Latest'
+    },
+    'ListLatestTweetsTimeline': {
+        'count': 20
+    },
+}
+
 class TwitterAPI:
-    def __init__(self, auth_token=None, proxy=None):
+    def __init__(self, auth_token=None, proxy=None, session_factory=None, rate_limiter=None,
+                 rest_id_store=None, rest_id_cache_size=10000, response_cache=None, cache_ttls=None,
+                 circuit_breaker=None, proxy_pool=None, auth_tokens=None, quarantine_seconds=QUARANTINE_SECONDS,
+                 sync_store=None):
         """
         初始化Twitter API客户端
         
         Args:
             auth_token: Twitter认证token
             proxy: HTTP代理地址
+            session_factory: 返回aiohttp.ClientSession的协程函数，供异步方法使用
+            rate_limiter: 异步请求共享的限流器
+            rest_id_store: 可选的rest_id持久化存储，需提供 get(screen_name) 和 set(screen_name, rest_id)
+            rest_id_cache_size: 内存中缓存的screen_name -> rest_id数量
+            response_cache: 可选的时间线响应缓存（MemoryResponseCache/SQLiteResponseCache）
+            cache_ttls: 各接口的缓存时间（秒），默认使用cache.DEFAULT_CACHE_TTLS
+            circuit_breaker: 可选的熔断器，上游持续出错时直接跳过请求
+            proxy_pool: 可选的代理池，每次请求按延迟和错误率选择代理
+            auth_tokens: 多个认证token组成的凭证池，请求分配给剩余额度最多的token
+            quarantine_seconds: 连续认证失败的token被隔离的时间（秒）
+            sync_store: 增量同步进度的存储（MemorySyncStateStore/SQLiteSyncStateStore），默认保存在内存中
         """
         self.utils = TwitterUtils(
             auth_token=auth_token,
-            proxy=proxy
+            proxy=proxy,
+            session_factory=session_factory,
+            rate_limiter=rate_limiter,
+            circuit_breaker=circuit_breaker,
+            proxy_pool=proxy_pool,
+            auth_tokens=auth_tokens,
+            quarantine_seconds=quarantine_seconds,
+            response_cache=response_cache,
+            cache_ttls=cache_ttls
         )
+        self.rest_ids = LRUCache(rest_id_cache_size)
+        self.rest_id_store = rest_id_store
+        self.sync_store = sync_store if sync_store is not None else MemorySyncStateStore()
     
-    def get_user_data(self, user_id):
-        """获取用户数据"""
+    def cache_stats(self):
+        """获取响应缓存和rest_id缓存的命中统计"""
+        stats = {
+            'rest_ids': {
+                'size': len(self.rest_ids),
+                'maxsize': self.rest_ids.maxsize,
+                'hits': self.rest_ids.hits,
+                'misses': self.rest_ids.misses,
+            }
+        }
+        if self.utils.response_cache is not None:
+            stats['responses'] = self.utils.response_cache.stats()
+        return stats
+    
+    def credential_stats(self):
+        """获取凭证池中各token的剩余额度和隔离状态"""
+        return self.utils.credentials.snapshot()
+    
+    def guest_token_stats(self):
+        """获取访客token池的状态"""
+        return self.utils.guest_tokens.snapshot()
+    
+    def cached_rest_id(self, screen_name):
+        """从内存缓存或持久化存储中查找rest_id，不发起网络请求"""
+        key = screen_name.lower()
+        rest_id = self.rest_ids.get(key)
+        if rest_id is None and self.rest_id_store is not None:
+            try:
+                rest_id = self.rest_id_store.get(screen_name)
+            except Exception as e:
+                logger.warning(f"Failed to load rest_id for {screen_name}: {e}")
+            if rest_id:
+                self.rest_ids.set(key, rest_id)
+        return rest_id
+    
+    def remember_rest_id(self, screen_name, rest_id):
+        """记录screen_name -> rest_id，变化时写入持久化存储"""
+        key = screen_name.lower()
+        if self.rest_ids.get(key) == rest_id:
+            return
+        self.rest_ids.set(key, rest_id)
+        if self.rest_id_store is not None:
+            try:
+                self.rest_id_store.set(screen_name, rest_id)
+            except Exception as e:
+                logger.warning(f"Failed to save rest_id for {screen_name}: {e}")
+    
+    def forget_rest_id(self, screen_name):
+        """清除失效的rest_id，下次使用时重新解析"""
+        self.rest_ids.pop(screen_name.lower())
+        if self.rest_id_store is not None:
+            try:
+                self.rest_id_store.set(screen_name, None)
+            except Exception as e:
+                logger.warning(f"Failed to clear rest_id for {screen_name}: {e}")
+    
+    def _user_data_request(self, user_id):
+        """构建获取用户数据的请求URL和参数"""
         if user_id.startswith('+'):
             # 使用用户ID
             variables = {
@@ -47,36 +164,168 @@ class TwitterAPI:
         }
         
         url = f"{BASE_URL}{endpoint}"
-        data = self.utils.twitter_request(url, params, allow_no_auth=True)
-        return data
+        return url, params
     
-    def get_user(self, user_id):
-        """获取用户信息"""
-        user_data = self.get_user_data(user_id)
+    def _parse_user_result(self, user_data):
+        """从用户数据响应中提取用户result（包含rest_id和legacy）"""
         logger.info(f"User data response: {user_data}")
         if user_data:
             user_result = user_data.get('data', {}).get('user') or user_data.get('data', {}).get('user_result')
             logger.info(f"User result: {user_result}")
             if user_result:
-                legacy_data = user_result.get('result', {}).get('legacy')
-                logger.info(f"Legacy data: {legacy_data}")
-                return legacy_data
+                return user_result.get('result')
         return None
     
+    def _extract_rest_id(self, user_data, screen_name=None):
+        """从用户数据响应中提取rest_id，指定screen_name时要求用户名一致"""
+        user_result = (user_data or {}).get('data', {}).get('user') or (user_data or {}).get('data', {}).get('user_result')
+        result = (user_result or {}).get('result') or {}
+        if screen_name is not None:
+            current = (result.get('legacy') or {}).get('screen_name') or ''
+            if current.lower() != screen_name.lower():
+                return None
+        return result.get('rest_id')
+    
+    def _resolve_rest_id(self, screen_name, refresh=False):
+        """解析screen_name对应的rest_id，优先使用缓存"""
+        if not refresh:
+            rest_id = self.cached_rest_id(screen_name)
+            if rest_id:
+                return rest_id
+        
+        url, params = self._user_data_request(screen_name)
+        rest_id = self._extract_rest_id(self.utils.twitter_request(url, params, allow_no_auth=True))
+        if rest_id:
+            self.remember_rest_id(screen_name, rest_id)
+        elif refresh:
+            self.forget_rest_id(screen_name)
+        return rest_id
+    
+    def _parse_user(self, user_data):
+        """从用户数据响应中提取legacy用户信息"""
+        result = self._parse_user_result(user_data)
+        if result:
+            legacy_data = result.get('legacy')
+            logger.info(f"Legacy data: {legacy_data}")
+            return legacy_data
+        return None
+    
+    def _users_by_rest_ids_request(self, rest_ids):
+        """构建批量获取用户数据的请求URL和参数"""
+        variables = {
+            'userIds': [str(rest_id) for rest_id in rest_ids],
+            'withSafetyModeUserFields': True
+        }
+        params = {
+            'variables': json.dumps(variables),
+            'features': json.dumps(GQL_FEATURES['UsersByRestIds'])
+        }
+        url = f"{BASE_URL}{GQL_MAP['UsersByRestIds']}"
+        return url, params
+    
+    def _parse_users(self, users_data):
+        """从批量用户数据响应中提取 {rest_id: legacy用户信息}"""
+        users = {}
+        if not users_data:
+            return users
+        for item in users_data.get('data', {}).get('users', []):
+            result = (item or {}).get('result') or {}
+            if result.get('rest_id') and result.get('legacy'):
+                users[result['rest_id']] = result['legacy']
+        return users
+    
+    def get_user_data(self, user_id):
+        """获取用户数据
+
+        按用户名查询时，如果已知rest_id则改用UserByRestId；
+        用户改名或查询失败时清除缓存的rest_id，回退到按用户名查询。
+        """
+        if not user_id.startswith('+'):
+            rest_id = self.cached_rest_id(user_id)
+            if rest_id:
+                url, params = self._user_data_request(f"+{rest_id}")
+                data = self.utils.twitter_request(url, params, allow_no_auth=True)
+                if self._extract_rest_id(data, user_id):
+                    return data
+                self.forget_rest_id(user_id)
+        
+        url, params = self._user_data_request(user_id)
+        data = self.utils.twitter_request(url, params, allow_no_auth=True)
+        if not user_id.startswith('+'):
+            rest_id = self._extract_rest_id(data)
+            if rest_id:
+                self.remember_rest_id(user_id, rest_id)
+        return data
+    
+    async def get_user_data_async(self, user_id):
+        """获取用户数据（异步）"""
+        if not user_id.startswith('+'):
+            rest_id = self.cached_rest_id(user_id)
+            if rest_id:
+                url, params = self._user_data_request(f"+{rest_id}")
+                data = await self.utils.twitter_request_async(url, params, allow_no_auth=True)
+                if self._extract_rest_id(data, user_id):
+                    return data
+                self.forget_rest_id(user_id)
+        
+        url, params = self._user_data_request(user_id)
+        data = await self.utils.twitter_request_async(url, params, allow_no_auth=True)
+        if not user_id.startswith('+'):
+            rest_id = self._extract_rest_id(data)
+            if rest_id:
+                self.remember_rest_id(user_id, rest_id)
+        return data
+    
+    def get_user(self, user_id):
+        """获取用户信息"""
+        return self._parse_user(self.get_user_data(user_id))
+    
+    async def get_user_async(self, user_id):
+        """获取用户信息（异步）"""
+        return self._parse_user(await self.get_user_data_async(user_id))
+    
+    async def get_user_result_async(self, user_id):
+        """获取用户result，包含rest_id和legacy用户信息（异步）"""
+        return self._parse_user_result(await self.get_user_data_async(user_id))
+    
+    def _merge_users(self, users, chunk, users_data):
+        """合并一次批量请求的结果；请求失败时该组rest_id记为None，与响应中不存在的用户区分开"""
+        if not users_data or users_data.get('data') is None:
+            users.update(dict.fromkeys(str(rest_id) for rest_id in chunk))
+        else:
+            users.update(self._parse_users(users_data))
+    
+    def get_users_by_rest_ids(self, rest_ids):
+        """批量获取用户信息，返回 {rest_id: legacy用户信息}
+
+        超过单次请求上限时自动拆分为多个请求。请求失败（限流、超时等）的rest_id对应None，
+        请求成功但找不到的用户不会出现在结果中。
+        """
+        users = {}
+        rest_ids = list(rest_ids)
+        for i in range(0, len(rest_ids), USERS_BY_REST_IDS_MAX):
+            chunk = rest_ids[i:i + USERS_BY_REST_IDS_MAX]
+            url, params = self._users_by_rest_ids_request(chunk)
+            self._merge_users(users, chunk, self.utils.twitter_request(url, params, allow_no_auth=True))
+        return users
+    
+    async def get_users_by_rest_ids_async(self, rest_ids):
+        """批量获取用户信息，返回 {rest_id: legacy用户信息}（异步），请求失败的rest_id对应None"""
+        users = {}
+        rest_ids = list(rest_ids)
+        for i in range(0, len(rest_ids), USERS_BY_REST_IDS_MAX):
+            chunk = rest_ids[i:i + USERS_BY_REST_IDS_MAX]
+            url, params = self._users_by_rest_ids_request(chunk)
+            self._merge_users(users, chunk, await self.utils.twitter_request_async(url, params, allow_no_auth=True))
+        return users
+    
     def get_user_tweets(self, user_id, params=None):
         """获取用户推文"""
         if params is None:
             params = {}
         
         def fetch_tweets(id, params):
-            variables = {
-                **params,
-                'count': 20,
-                'includePromotedContent': True,
-                'withQuickPromoteEligibilityTweetFields': True,
-                'withVoice': True,
-                'withV2Timeline': True
-            }
+            variables = {**params, **TIMELINE_VARIABLES['UserTweets']}
             
             entries = self.utils.pagination_tweets('UserTweets', id, variables)
             return self.utils.gather_legacy_from_data(entries)
@@ -89,14 +338,7 @@ class TwitterAPI:
             params = {}
         
         def fetch_tweets_and_replies(id, params):
-            variables = {
-                **params,
-                'count': 20,
-                'includePromotedContent': True,
-                'withCommunity': True,
-                'withVoice': True,
-                'withV2Timeline': True
-            }
+            variables = {**params, **TIMELINE_VARIABLES['UserTweetsAndReplies']}
             
             entries = self.utils.pagination_tweets('UserTweetsAndReplies', id, variables)
             return self.utils.gather_legacy_from_data(entries, ['profile-conversation-'], id)
@@ -142,14 +384,7 @@ class TwitterAPI:
             params = {}
         
         def fetch_likes(id, params):
-            variables = {
-                **params,
-                'includeHasBirdwatchNotes': False,
-                'includePromotedContent': False,
-                'withBirdwatchNotes': False,
-                'withVoice': False,
-                'withV2Timeline': True
-            }
+            variables = {**params, **TIMELINE_VARIABLES['Likes']}
             
             entries = self.utils.pagination_tweets('Likes', id, variables)
             return self.utils.gather_legacy_from_data(entries)
@@ -186,13 +421,7 @@ class TwitterAPI:
         if params is None:
             params = {}
         
-        variables = {
-            **params,
-            'rawQuery': keywords,
-            'count': 20,
-            'querySource': 'typed_query',
-            'product': 'Latest'
-        }
+        variables = {**params, 'rawQuery': keywords, **TIMELINE_VARIABLES['SearchTimeline']}
         
         entries = self.utils.pagination_tweets(
             'SearchTimeline', 
@@ -207,11 +436,7 @@ class TwitterAPI:
         if params is None:
             params = {}
         
-        variables = {
-            **params,
-            'listId': list_id,
-            'count': 20
-        }
+        variables = {**params, 'listId': list_id, **TIMELINE_VARIABLES['ListLatestTweetsTimeline']}
         
         entries = self.utils.pagination_tweets(
             'ListLatestTweetsTimeline', 
@@ -265,29 +490,184 @@ class TwitterAPI:
         )
         return self.utils.gather_legacy_from_data(entries)
     
+    async def _resolve_rest_id_async(self, user_id):
+        """解析用户名对应的rest_id（异步），已经是rest_id时直接返回"""
+        if str(user_id).isdigit():
+            return str(user_id)
+        rest_id = self.cached_rest_id(user_id)
+        if rest_id:
+            return rest_id
+        result = await self.get_user_result_async(user_id)
+        return (result or {}).get('rest_id')
+    
+    async def _iter_user_timeline_async(self, endpoint, user_id, params, filter_nested=None,
+                                        own_only=False, **limits):
+        """解析rest_id后逐条获取用户时间线"""
+        rest_id = await self._resolve_rest_id_async(user_id)
+        if not rest_id:
+            logger.error(f"User not found: {user_id}")
+            return
+        
+        variables = {**(params or {}), **TIMELINE_VARIABLES[endpoint]}
+        async for tweet in self.utils.iter_tweets_async(
+            endpoint, rest_id, variables,
+            filter_nested=filter_nested,
+            filter_user_id=rest_id if own_only else None,
+            **limits
+        ):
+            yield tweet
+    
+    def iter_user_tweets_async(self, user_id, params=None, max_items=None, max_pages=None, prefetch=True,
+                               compact=False):
+        """逐条获取用户推文，按cursor自动翻页（异步生成器）
+        
+        Example:
+            async for tweet in api.iter_user_tweets_async('username', max_items=500):
+                ...
+        """
+        return self._iter_user_timeline_async(
+            'UserTweets', user_id, params,
+            max_items=max_items, max_pages=max_pages, prefetch=prefetch, compact=compact
+        )
+    
+    def iter_user_tweets_and_replies_async(self, user_id, params=None, max_items=None, max_pages=None,
+                                           prefetch=True, compact=False):
+        """逐条获取用户推文和回复，按cursor自动翻页（异步生成器）"""
+        return self._iter_user_timeline_async(
+            'UserTweetsAndReplies', user_id, params, ['profile-conversation-'], own_only=True,
+            max_items=max_items, max_pages=max_pages, prefetch=prefetch, compact=compact
+        )
+    
+    def iter_user_likes_async(self, user_id, params=None, max_items=None, max_pages=None, prefetch=True,
+                              compact=False):
+        """逐条获取用户点赞的推文，按cursor自动翻页（异步生成器）"""
+        return self._iter_user_timeline_async(
+            'Likes', user_id, params,
+            max_items=max_items, max_pages=max_pages, prefetch=prefetch, compact=compact
+        )
+    
+    def iter_search_async(self, keywords, params=None, max_items=None, max_pages=None, prefetch=True,
+                          compact=False):
+        """逐条获取搜索结果，按cursor自动翻页（异步生成器）"""
+        variables = {**(params or {}), 'rawQuery': keywords, **TIMELINE_VARIABLES['SearchTimeline']}
+        return self.utils.iter_tweets_async(
+            'SearchTimeline', None, variables, ['search_by_raw_query', 'search_timeline', 'timeline'],
+            max_items=max_items, max_pages=max_pages, prefetch=prefetch, compact=compact
+        )
+    
+    def iter_list_async(self, list_id, params=None, max_items=None, max_pages=None, prefetch=True,
+                        compact=False):
+        """逐条获取列表推文，按cursor自动翻页（异步生成器）"""
+        variables = {**(params or {}), 'listId': list_id, **TIMELINE_VARIABLES['ListLatestTweetsTimeline']}
+        return self.utils.iter_tweets_async(
+            'ListLatestTweetsTimeline', None, variables, ['list', 'tweets_timeline', 'timeline'],
+            max_items=max_items, max_pages=max_pages, prefetch=prefetch, compact=compact
+        )
+    
+    def _sync_request(self, user_id, params, replies):
+        """增量同步使用的接口、请求变量和过滤条件"""
+        endpoint = 'UserTweetsAndReplies' if replies else 'UserTweets'
+        variables = {**(params or {}), **TIMELINE_VARIABLES[endpoint]}
+        filter_nested = ['profile-conversation-'] if replies else None
+        filter_user_id = user_id if replies else None
+        return endpoint, variables, filter_nested, filter_user_id
+    
+    def _load_sync_state(self, key):
+        try:
+            return self.sync_store.get(key)
+        except Exception as e:
+            logger.warning(f"Failed to load sync state for {key}: {e}")
+            return None
+    
+    def _save_sync_state(self, key, state):
+        try:
+            self.sync_store.set(key, state)
+        except Exception as e:
+            logger.warning(f"Failed to save sync state for {key}: {e}")
+    
+    def sync_user_tweets(self, user_id, params=None, replies=False, max_pages=5, compact=False):
+        """增量同步用户推文，只返回上次同步之后的新推文（按ID从新到旧）
+        
+        首次同步只取最新一页并记录最新推文ID和Top cursor；之后只请求比上次更新的条目，
+        账号没有新推文时几乎不产生流量。同步进度保存在sync_store中。
+        单次同步的页数不足以接上上次的进度时，剩余的较早推文由下次同步继续补齐。
+        
+        Args:
+            user_id: 用户名或rest_id
+            params: 额外的请求变量
+            replies: 是否包含用户的回复
+            max_pages: 单次同步最多请求的页数
+            compact: 是否返回紧凑的Tweet记录
+        """
+        rest_id = str(user_id) if str(user_id).isdigit() else self._resolve_rest_id(user_id)
+        if not rest_id:
+            logger.error(f"User not found: {user_id}")
+            return []
+        
+        endpoint, variables, filter_nested, filter_user_id = self._sync_request(rest_id, params, replies)
+        key = f"{endpoint}:{rest_id}"
+        sync = TimelineSync(self._load_sync_state(key), max_pages)
+        
+        more = True
+        while more:
+            page_variables = {**variables, 'cursor': sync.cursor} if sync.cursor else variables
+            entries = self.utils.pagination_tweets(endpoint, rest_id, page_variables, use_cache=False)
+            tweets = self.utils.gather_legacy_from_data(entries, filter_nested, filter_user_id, compact)
+            more = sync.feed(entries, tweets)
+        
+        self._save_sync_state(key, sync.state())
+        logger.info(f"Synced {len(sync.tweets)} new tweets for {user_id} in {sync.pages} requests")
+        return sync.result()
+    
+    async def sync_user_tweets_async(self, user_id, params=None, replies=False, max_pages=5, compact=False):
+        """增量同步用户推文（异步），见sync_user_tweets"""
+        rest_id = await self._resolve_rest_id_async(user_id)
+        if not rest_id:
+            logger.error(f"User not found: {user_id}")
+            return []
+        
+        endpoint, variables, filter_nested, filter_user_id = self._sync_request(rest_id, params, replies)
+        key = f"{endpoint}:{rest_id}"
+        sync = TimelineSync(self._load_sync_state(key), max_pages)
+        
+        more = True
+        while more:
+            page_variables = {**variables, 'cursor': sync.cursor} if sync.cursor else variables
+            entries = await self.utils.pagination_tweets_async(endpoint, rest_id, page_variables, use_cache=False)
+            tweets = self.utils.gather_legacy_from_data(entries, filter_nested, filter_user_id, compact)
+            more = sync.feed(entries, tweets)
+        
+        self._save_sync_state(key, sync.state())
+        logger.info(f"Synced {len(sync.tweets)} new tweets for {user_id} in {sync.pages} requests")
+        return sync.result()
+    
+    def reset_sync(self, user_id, replies=False):
+        """清除用户的增量同步进度，下次同步从最新一页重新开始"""
+        rest_id = str(user_id) if str(user_id).isdigit() else self.cached_rest_id(user_id)
+        if rest_id:
+            endpoint = 'UserTweetsAndReplies' if replies else 'UserTweets'
+            self._save_sync_state(f"{endpoint}:{rest_id}", None)
+    
     def _cache_try_get(self, user_id, params, func):
-        """缓存尝试获取数据"""
-        # 这里简化了缓存逻辑，实际使用时可以添加Redis或内存缓存
+        """把用户名解析为rest_id后获取数据"""
         try:
             # 如果user_id是数字，说明已经是rest_id，直接使用
             if str(user_id).isdigit():
                 return func(user_id, params)
             
-            # 否则先获取用户信息来获取rest_id
-            user_data = self.get_user_data(user_id)
-            if not user_data:
-                raise Exception('User not found')
-            
-            user_result = user_data.get('data', {}).get('user') or user_data.get('data', {}).get('user_result')
-            if not user_result:
-                raise Exception('User not found')
-            
-            rest_id = user_result.get('result', {}).get('rest_id')
+            # 否则先从缓存中获取rest_id，缓存中没有时才查询用户信息
+            rest_id = self._resolve_rest_id(user_id)
             if not rest_id:
                 raise Exception('User not found')
             
-            return func(rest_id, params)
+            result = func(rest_id, params)
+            if not result:
+                # 缓存的rest_id可能已失效，重新解析一次
+                fresh_rest_id = self._resolve_rest_id(user_id, refresh=True)
+                if fresh_rest_id and fresh_rest_id != rest_id:
+                    result = func(fresh_rest_id, params)
+            return result
             
         except Exception as e:
             logger.error(f"Error in _cache_try_get: {e}")
-            return [] 
\ No newline at end of file
+            return []
\ No newline at end of file
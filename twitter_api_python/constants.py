@@ -11,6 +11,7 @@ GRAPHQL_ENDPOINTS_PLAIN = [
     '/graphql/bt4TKuFz4T7Ckk-VvQVSow/UserTweetsAndReplies',
     '/graphql/dexO_2tohK86JDudXXG3Yw/UserMedia',
     '/graphql/Qw77dDjp9xCpUY-AXwt-yQ/UserByRestId',
+    '/graphql/itEhGywpgX9b3GJCzOtSrA/UsersByRestIds',
     '/graphql/UN1i3zUiCWa-6r-Uaho4fw/SearchTimeline',
     '/graphql/Pa45JvqZuKcW1plybfgBlQ/ListLatestTweetsTimeline',
     '/graphql/QuBlQ6SxNAQCt6-kBiCXCQ/TweetDetail',
@@ -22,6 +23,9 @@ for endpoint in GRAPHQL_ENDPOINTS_PLAIN:
     key = endpoint.split('/')[3].replace('V2', '').replace('Query', '').replace('QueryV2', '')
     GQL_MAP[key] = endpoint
 
+# UsersByRestIds 单次请求最多查询的用户数
+USERS_BY_REST_IDS_MAX = 100
+
 # Third party supported API
 THIRD_PARTY_SUPPORTED_API = [
     'UserByScreenName', 'UserByRestId', 'UserTweets', 
@@ -99,6 +103,7 @@ TWEET_DETAIL_FEATURES = {
 GQL_FEATURES = {
     "UserByScreenName": GQL_FEATURE_USER,
     "UserByRestId": GQL_FEATURE_USER,
+    "UsersByRestIds": GQL_FEATURE_USER,
     "UserTweets": GQL_FEATURE_FEED,
     "UserTweetsAndReplies": GQL_FEATURE_FEED,
     "UserMedia": GQL_FEATURE_FEED,
@@ -0,0 +1,151 @@
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 连续认证失败多少次后隔离凭证
+MAX_AUTH_FAILURES = 2
+# 凭证被隔离的时间（秒）
+QUARANTINE_SECONDS = 15 * 60
+
+
+def mask_token(token):
+    """隐藏token内容，只保留末尾几位用于区分"""
+    if not token or len(token) <= 8:
+        return token
+    return f"***{token[-4:]}"
+
+
+class Credential:
+    """单个auth token及其会话状态（cookies/CSRF token）和剩余请求额度"""
+
+    def __init__(self, token):
+        self.token = token
+        self.cookies = {}
+        self.csrf_token = None
+        self.session_expires_at = 0
+
+        # 上游返回的剩余请求数和重置时间，未知时为None
+        self.remaining = None
+        self.reset_at = 0
+        self.in_flight = 0
+        self.last_used = 0.0
+
+        self.failures = 0
+        self.quarantined_until = 0
+        self.requests = 0
+        self._lock = None
+
+    def session_valid(self):
+        """缓存的cookies是否仍然有效"""
+        return bool(self.cookies) and time.time() < self.session_expires_at
+
+    def set_session(self, cookies, csrf_token, ttl):
+        self.cookies = cookies
+        self.csrf_token = csrf_token
+        self.session_expires_at = time.time() + ttl
+        return self.cookies
+
+    def invalidate(self):
+        self.cookies = {}
+        self.csrf_token = None
+        self.session_expires_at = 0
+
+    def get_lock(self):
+        """会话刷新锁，避免同一凭证的并发请求同时刷新cookies"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def budget(self, now=None):
+        """估计的剩余请求额度，没有限流信息或已过重置时间时视为不受限"""
+        now = time.time() if now is None else now
+        if self.remaining is None or now >= self.reset_at:
+            return float('inf')
+        return self.remaining - self.in_flight
+
+    def quarantined(self, now=None):
+        now = time.time() if now is None else now
+        return now < self.quarantined_until
+
+
+class CredentialPool:
+    """多个auth token组成的凭证池，按剩余额度分配请求，认证失败的凭证暂时隔离"""
+
+    def __init__(self, tokens, max_failures=MAX_AUTH_FAILURES, quarantine_seconds=QUARANTINE_SECONDS):
+        self.credentials = [Credential(token) for token in dict.fromkeys(tokens) if token]
+        self.max_failures = max_failures
+        self.quarantine_seconds = quarantine_seconds
+
+    def __len__(self):
+        return len(self.credentials)
+
+    def available(self, exclude=()):
+        """未被隔离、且不在exclude中的凭证"""
+        now = time.time()
+        return [c for c in self.credentials if not c.quarantined(now) and c not in exclude]
+
+    def acquire(self, exclude=()):
+        """选择剩余额度最多的凭证，额度相同时选择最久未使用的；没有可用凭证时返回None"""
+        candidates = self.available(exclude)
+        if not candidates:
+            return None
+        now = time.time()
+        credential = max(candidates, key=lambda c: (c.budget(now), -c.last_used))
+        credential.in_flight += 1
+        credential.requests += 1
+        credential.last_used = time.monotonic()
+        return credential
+
+    def has_budget(self, exclude=()):
+        """是否还有其他凭证有剩余额度"""
+        now = time.time()
+        return any(c.budget(now) > 0 for c in self.available(exclude))
+
+    def release(self, credential, headers=None, status=None):
+        """请求结束后归还凭证，根据响应更新剩余额度和失败次数"""
+        if credential is None:
+            return
+        credential.in_flight = max(0, credential.in_flight - 1)
+        headers = headers or {}
+
+        try:
+            remaining = headers.get('x-rate-limit-remaining')
+            reset_at = headers.get('x-rate-limit-reset')
+            if remaining is not None and reset_at is not None:
+                credential.remaining = int(remaining)
+                credential.reset_at = float(reset_at)
+            elif status == 429:
+                retry_after = headers.get('Retry-After')
+                credential.remaining = 0
+                credential.reset_at = time.time() + (float(retry_after) if retry_after else 60)
+        except ValueError:
+            logger.warning(f"Ignoring malformed rate limit headers for {mask_token(credential.token)}")
+
+        if status in (401, 403):
+            credential.failures += 1
+            if credential.failures >= self.max_failures:
+                credential.quarantined_until = time.time() + self.quarantine_seconds
+                credential.failures = 0
+                credential.invalidate()
+                logger.warning(
+                    f"Quarantining Twitter credential {mask_token(credential.token)} "
+                    f"for {self.quarantine_seconds}s after repeated auth failures"
+                )
+        elif status is not None and status < 400:
+            credential.failures = 0
+
+    def snapshot(self):
+        now = time.time()
+        return [
+            {
+                'credential': mask_token(c.token),
+                'remaining': c.remaining if c.remaining is not None and now < c.reset_at else None,
+                'reset_in_seconds': round(max(0.0, c.reset_at - now), 1),
+                'in_flight': c.in_flight,
+                'requests': c.requests,
+                'quarantined_for_seconds': round(max(0.0, c.quarantined_until - now), 1),
+            }
+            for c in self.credentials
+        ]
@@ -0,0 +1,210 @@
+import time
+import logging
+import sqlite3
+import threading
+
+from .tweet import Tweet
+from .utils import TwitterUtils
+
+logger = logging.getLogger(__name__)
+
+
+def tweet_id(tweet):
+    """推文ID的数值，用于比较先后；ID缺失或无法解析时返回0"""
+    value = tweet.id_str if isinstance(tweet, Tweet) else (tweet or {}).get('id_str')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class TimelineSync:
+    """一次增量同步的翻页过程，同步和异步接口共用
+
+    有保存的进度时先用Top cursor只请求更新的条目，账号没有新推文时响应里只有cursor条目；
+    没有进度或Top cursor失效时从最新一页开始按Bottom cursor向后翻页，遇到已同步过的推文立即停止。
+    首次同步只取最新一页作为起点。
+
+    向后翻页在遇到已同步过的推文之前用完翻页预算（或请求失败）时，中间还有没取到的推文：
+    这时不推进newest_id，而是保存续扫的Bottom cursor，下次同步先从这里继续向后翻页，补齐后再推进。
+    """
+
+    def __init__(self, state=None, max_pages=5):
+        state = state or {}
+        self.newest_id = int(state.get('newest_id') or 0)
+        self.top_cursor = state.get('top_cursor')
+        # 未补齐的缺口：续扫位置和缺口之上已取到的最新推文ID
+        self.resume_cursor = state.get('resume_cursor') if self.newest_id else None
+        self.gap_newest_id = int(state.get('gap_newest_id') or 0) if self.resume_cursor else 0
+        self.max_pages = max(1, max_pages)
+        self.pages = 0
+        self.tweets = {}
+        # 只有已知最新推文ID时Top cursor请求的结果才能判断是否有遗漏；有缺口时先补齐缺口
+        self.forward = bool(self.newest_id and self.top_cursor and not self.resume_cursor)
+        if self.resume_cursor:
+            self.cursor = self.resume_cursor
+        else:
+            self.cursor = self.top_cursor if self.forward else None
+
+    @property
+    def complete(self):
+        """上次同步的位置和本次取到的推文之间是否没有缺口"""
+        return not self.resume_cursor
+
+    def _collect(self, tweets):
+        """记录新推文，返回是否遇到了已同步过的推文"""
+        reached_seen = False
+        for tweet in tweets:
+            value = tweet_id(tweet)
+            if value > self.newest_id:
+                self.tweets.setdefault(value, tweet)
+            else:
+                reached_seen = True
+        return reached_seen
+
+    def _stop_with_gap(self, cursor):
+        """没有遇到已同步过的推文就停止向后翻页，记录下次续扫的位置"""
+        self.resume_cursor = cursor
+        logger.warning(
+            f"Timeline sync stopped after {self.pages} requests before reaching tweet {self.newest_id}, "
+            f"older tweets will be fetched by the next sync"
+        )
+        return False
+
+    def feed(self, entries, tweets):
+        """处理一页结果，返回是否需要继续请求self.cursor"""
+        self.pages += 1
+        top = TwitterUtils.find_cursor(entries, 'Top')
+
+        if self.forward:
+            if not entries:
+                # Top cursor失效或请求失败，改为从最新一页扫描；失败的请求不占用翻页预算
+                self.pages -= 1
+                self.forward = False
+                self.cursor = None
+                return True
+            before = len(self.tweets)
+            self._collect(tweets)
+            if top:
+                previous, self.top_cursor = self.cursor, top
+                # 新条目可能超过一页，继续向更新的方向翻页
+                if len(self.tweets) > before and top != previous and self.pages < self.max_pages:
+                    self.cursor = top
+                    return True
+            return False
+
+        if not entries:
+            # 请求失败：翻页途中失败时保留缺口，从失败的位置续扫
+            if self.cursor is not None and self.newest_id:
+                return self._stop_with_gap(self.cursor)
+            return False
+
+        if self.cursor is None and top:
+            self.top_cursor = top
+        reached_seen = self._collect(tweets)
+        bottom = TwitterUtils.find_cursor(entries, 'Bottom')
+        if not self.newest_id or reached_seen or not tweets or not bottom or bottom == self.cursor:
+            # 首次同步、已经接上上次的进度或时间线已经到底，没有缺口
+            self.resume_cursor = None
+            return False
+        if self.pages >= self.max_pages:
+            return self._stop_with_gap(bottom)
+        self.cursor = bottom
+        return True
+
+    def result(self):
+        """本次同步到的新推文，按ID从新到旧排列"""
+        return [self.tweets[value] for value in sorted(self.tweets, reverse=True)]
+
+    def state(self):
+        collected = max(self.tweets, default=0)
+        if self.resume_cursor:
+            # 缺口未补齐，newest_id保持不变，缺口之上取到的推文ID单独记录
+            gap_newest_id = max(self.gap_newest_id, collected)
+            return {
+                'newest_id': str(self.newest_id),
+                'top_cursor': self.top_cursor,
+                'resume_cursor': self.resume_cursor,
+                'gap_newest_id': str(gap_newest_id) if gap_newest_id else None,
+            }
+        newest_id = max(self.newest_id, self.gap_newest_id, collected)
+        return {
+            'newest_id': str(newest_id) if newest_id else None,
+            'top_cursor': self.top_cursor,
+            'resume_cursor': None,
+            'gap_newest_id': None,
+        }
+
+
+class MemorySyncStateStore:
+    """进程内保存的时间线同步进度，进程重启后从头同步"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            state = self._data.get(key)
+            return dict(state) if state else None
+
+    def set(self, key, state):
+        with self._lock:
+            if state is None:
+                self._data.pop(key, None)
+            else:
+                self._data[key] = dict(state)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteSyncStateStore:
+    """保存在SQLite文件中的时间线同步进度（最新推文ID、Top cursor和未补齐缺口的续扫位置）"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+        CREATE TABLE IF NOT EXISTS timeline_sync_state (
+            key TEXT PRIMARY KEY,
+            newest_id TEXT,
+            top_cursor TEXT,
+            updated_at REAL NOT NULL
+        )''')
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(timeline_sync_state)')]
+        for column in ('resume_cursor', 'gap_newest_id'):
+            if column not in columns:
+                self._conn.execute(f'ALTER TABLE timeline_sync_state ADD COLUMN {column} TEXT')
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT newest_id, top_cursor, resume_cursor, gap_newest_id FROM timeline_sync_state WHERE key = ?',
+                (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'newest_id': row[0], 'top_cursor': row[1], 'resume_cursor': row[2], 'gap_newest_id': row[3]}
+
+    def set(self, key, state):
+        with self._lock:
+            if state is None:
+                self._conn.execute('DELETE FROM timeline_sync_state WHERE key = ?', (key,))
+            else:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO timeline_sync_state '
+                    '(key, newest_id, top_cursor, resume_cursor, gap_newest_id, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, state.get('newest_id'), state.get('top_cursor'), state.get('resume_cursor'),
+                     state.get('gap_newest_id'), time.time())
+                )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM timeline_sync_state').fetchone()[0]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,154 @@
+"""
+紧凑的推文记录
+
+从GraphQL响应中只拷贝常用字段，不修改也不引用原始响应，
+解析完成后原始响应树可以立即被回收。
+"""
+
+
+def _user_result(result):
+    """从推文result中取出作者的result"""
+    core = result.get('core') or {}
+    return (core.get('user_result') or {}).get('result') or (core.get('user_results') or {}).get('result')
+
+
+def _unwrap(result):
+    """部分推文（例如带可见性限制的）被包在tweet字段中"""
+    if result and result.get('tweet'):
+        return result['tweet']
+    return result
+
+
+class TwitterUser:
+    """推文作者的常用字段"""
+    __slots__ = ('id_str', 'screen_name', 'name', 'profile_image_url_https', 'followers_count', 'verified')
+
+    def __init__(self, id_str=None, screen_name=None, name=None, profile_image_url_https=None,
+                 followers_count=None, verified=False):
+        self.id_str = id_str
+        self.screen_name = screen_name
+        self.name = name
+        self.profile_image_url_https = profile_image_url_https
+        self.followers_count = followers_count
+        self.verified = verified
+
+    @classmethod
+    def from_result(cls, result):
+        legacy = (result or {}).get('legacy')
+        if not legacy:
+            return None
+        return cls(
+            id_str=result.get('rest_id') or legacy.get('id_str'),
+            screen_name=legacy.get('screen_name'),
+            name=legacy.get('name'),
+            profile_image_url_https=legacy.get('profile_image_url_https'),
+            followers_count=legacy.get('followers_count'),
+            verified=bool(legacy.get('verified') or result.get('is_blue_verified')),
+        )
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return f"TwitterUser(id_str={self.id_str!r}, screen_name={self.screen_name!r})"
+
+
+class Tweet:
+    """推文的常用字段，字段名与legacy格式保持一致"""
+    __slots__ = (
+        'id_str', 'full_text', 'created_at', 'lang', 'user_id_str', 'conversation_id_str',
+        'in_reply_to_status_id_str', 'in_reply_to_screen_name',
+        'favorite_count', 'retweet_count', 'reply_count', 'quote_count',
+        'hashtags', 'urls', 'user_mentions', 'media',
+        'user', 'quoted_status', 'retweeted_status',
+    )
+
+    def __init__(self, id_str=None, full_text=None, created_at=None, lang=None, user_id_str=None,
+                 conversation_id_str=None, in_reply_to_status_id_str=None, in_reply_to_screen_name=None,
+                 favorite_count=None, retweet_count=None, reply_count=None, quote_count=None,
+                 hashtags=(), urls=(), user_mentions=(), media=(),
+                 user=None, quoted_status=None, retweeted_status=None):
+        self.id_str = id_str
+        self.full_text = full_text
+        self.created_at = created_at
+        self.lang = lang
+        self.user_id_str = user_id_str
+        self.conversation_id_str = conversation_id_str
+        self.in_reply_to_status_id_str = in_reply_to_status_id_str
+        self.in_reply_to_screen_name = in_reply_to_screen_name
+        self.favorite_count = favorite_count
+        self.retweet_count = retweet_count
+        self.reply_count = reply_count
+        self.quote_count = quote_count
+        self.hashtags = hashtags
+        self.urls = urls
+        self.user_mentions = user_mentions
+        self.media = media
+        self.user = user
+        self.quoted_status = quoted_status
+        self.retweeted_status = retweeted_status
+
+    @classmethod
+    def from_result(cls, result, nested=True):
+        """从推文result构建记录；note tweet使用完整正文和实体
+
+        Args:
+            result: GraphQL响应中的推文result
+            nested: 是否同时解析引用和转发的推文
+        """
+        result = _unwrap(result)
+        legacy = (result or {}).get('legacy')
+        if not legacy:
+            return None
+
+        entities = legacy.get('entities') or {}
+        full_text = legacy.get('full_text')
+        note = (((result.get('note_tweet') or {}).get('note_tweet_results') or {}).get('result'))
+        if note:
+            entities = note.get('entity_set') or entities
+            full_text = note.get('text', full_text)
+
+        media = ((legacy.get('extended_entities') or {}).get('media')) or \
+            (legacy.get('entities') or {}).get('media') or []
+
+        tweet = cls(
+            id_str=result.get('rest_id') or legacy.get('id_str'),
+            full_text=full_text,
+            created_at=legacy.get('created_at'),
+            lang=legacy.get('lang'),
+            user_id_str=legacy.get('user_id_str'),
+            conversation_id_str=legacy.get('conversation_id_str'),
+            in_reply_to_status_id_str=legacy.get('in_reply_to_status_id_str'),
+            in_reply_to_screen_name=legacy.get('in_reply_to_screen_name'),
+            favorite_count=legacy.get('favorite_count'),
+            retweet_count=legacy.get('retweet_count'),
+            reply_count=legacy.get('reply_count'),
+            quote_count=legacy.get('quote_count'),
+            hashtags=tuple([item.get('text') for item in entities.get('hashtags') or ()]),
+            urls=tuple([item.get('expanded_url') or item.get('url') for item in entities.get('urls') or ()]),
+            user_mentions=tuple([item.get('screen_name') for item in entities.get('user_mentions') or ()]),
+            media=tuple([item.get('media_url_https') for item in media]),
+            user=TwitterUser.from_result(_user_result(result)),
+        )
+
+        if nested:
+            quote = _unwrap((result.get('quoted_status_result') or {}).get('result'))
+            if quote:
+                tweet.quoted_status = cls.from_result(quote, nested=False)
+            retweet = (legacy.get('retweeted_status_result') or {}).get('result')
+            if retweet:
+                tweet.retweeted_status = cls.from_result(retweet, nested=True)
+        return tweet
+
+    def to_dict(self):
+        """转换为legacy格式的dict，供JSON序列化使用"""
+        data = {field: getattr(self, field) for field in self.__slots__}
+        for field in ('user', 'quoted_status', 'retweeted_status'):
+            if data[field] is not None:
+                data[field] = data[field].to_dict()
+        for field in ('hashtags', 'urls', 'user_mentions', 'media'):
+            data[field] = list(data[field] or ())
+        return data
+
+    def __repr__(self):
+        return f"Tweet(id_str={self.id_str!r}, user_id_str={self.user_id_str!r})"
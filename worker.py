@@ -0,0 +1,39 @@
+import asyncio
+import signal
+import logging
+
+from main import init_database, start_scheduler, stop_scheduler, flush_rest_ids
+from http_client import start_http_client, close_http_client
+from database import start_database, close_database
+from sample_writer import sample_writer
+
+logger = logging.getLogger("worker")
+
+
+async def run_worker():
+    """独立运行调度器和抓取流水线，不提供HTTP接口"""
+    await start_database()
+    await init_database()
+    await start_http_client()
+    await sample_writer.start()
+    await start_scheduler()
+    logger.info("Fetch worker started")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    try:
+        await stop_event.wait()
+    finally:
+        logger.info("Fetch worker stopping")
+        await stop_scheduler()
+        await sample_writer.stop()
+        await flush_rest_ids()
+        await close_http_client()
+        await close_database()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())